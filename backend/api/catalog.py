@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import chain, islice
+from threading import Lock
+
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from recipes.models import STR_MAX_LENGHT, Ingredient, Tag
+from .versions import catalog_version_key, get_version
+
+
+class TagRecord(namedtuple('TagRecord', ('id', 'name', 'slug'))):
+    __slots__ = ()
+
+    def __str__(self):
+        return self.slug
+
+    def __repr__(self):
+        return f'<Tag: {self}>'
+
+
+class IngredientRecord(
+    namedtuple('IngredientRecord', ('id', 'name', 'measurement_unit'))
+):
+    __slots__ = ()
+
+    def __str__(self):
+        return f'{self.name[:STR_MAX_LENGHT]} ({self.measurement_unit})'
+
+    def __repr__(self):
+        return f'<Ingredient: {self}>'
+
+
+TagSnapshot = namedtuple(
+    'TagSnapshot', ('version', 'records', 'by_id', 'by_slug')
+)
+IngredientSnapshot = namedtuple(
+    'IngredientSnapshot',
+    ('version', 'records', 'by_id', 'search_names', 'search_records'),
+)
+
+
+class Catalog(ABC):
+    # Справочник целиком хранится в памяти процесса в виде неизменяемого
+    # снимка. Версия справочника лежит в общем кэше и обновляется после
+    # каждого изменения, поэтому устаревший снимок замечают все воркеры.
+    model = None
+    record = None
+
+    def __init__(self):
+        self.snapshot = None
+        self.lock = Lock()
+
+    def __deepcopy__(self, memo):
+        # Поля сериализаторов копируются вместе с аргументами, а справочник
+        # в процессе должен остаться один.
+        return self
+
+    @abstractmethod
+    def build(self, version, records):
+        pass
+
+    def load(self, context=None):
+        # В пределах одного ответа версия проверяется один раз: снимок
+        # запоминается в контексте сериализатора.
+        key = f'{self.model._meta.model_name}_catalog'
+        if context is not None and key in context:
+            return context[key]
+        version = get_version(catalog_version_key(self.model))
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                snapshot = self.snapshot
+                if snapshot is None or snapshot.version != version:
+                    snapshot = self.snapshot = self.build(version, tuple(
+                        self.record._make(values)
+                        for values in self.model.objects.values_list(
+                            *self.record._fields
+                        )
+                    ))
+        if context is not None:
+            context[key] = snapshot
+        return snapshot
+
+    def get(self, pk, context=None):
+        record = self.load(context).by_id.get(pk)
+        if record is None:
+            # Запись могла появиться после того, как был собран снимок.
+            record = self.record._make(
+                self.model.objects.values_list(
+                    *self.record._fields
+                ).get(pk=pk)
+            )
+        return record
+
+    @staticmethod
+    def to_representation(record):
+        return record._asdict()
+
+
+class TagCatalog(Catalog):
+    model = Tag
+    record = TagRecord
+
+    def build(self, version, records):
+        return TagSnapshot(
+            version,
+            records,
+            {record.id: record for record in records},
+            {record.slug: record for record in records},
+        )
+
+
+class IngredientCatalog(Catalog):
+    model = Ingredient
+    record = IngredientRecord
+
+    def build(self, version, records):
+        search_records = tuple(sorted(
+            records, key=lambda record: (record.name.casefold(), record)
+        ))
+        return IngredientSnapshot(
+            version,
+            records,
+            {record.id: record for record in records},
+            tuple(record.name.casefold() for record in search_records),
+            search_records,
+        )
+
+    def search(self, query):
+        query = query.casefold()
+        snapshot = self.load()
+        names, records = snapshot.search_names, snapshot.search_records
+        start = end = bisect_left(names, query)
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        contains = sorted(
+            (names[index].find(query), names[index], record)
+            for index, record in chain(
+                islice(enumerate(records), start),
+                islice(enumerate(records), end, None),
+            )
+            if query in names[index]
+        )
+        return [
+            *map(self.to_representation, records[start:end]),
+            *(self.to_representation(record) for *_, record in contains),
+        ]
+
+
+tag_catalog = TagCatalog()
+ingredient_catalog = IngredientCatalog()
+
+
+class CatalogViewSetMixin:
+    # Без параметров фильтрации список и отдельная запись отдаются
+    # из снимка справочника, без обращения к базе. Отфильтрованный список
+    # читается через values(): поля записи совпадают с полями сериализатора.
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            records = self.filter_queryset(self.get_queryset()).values(
+                *self.catalog.record._fields
+            )
+        else:
+            records = map(
+                self.catalog.to_representation, self.catalog.load().records
+            )
+        return self.get_not_modified_response(request) or Response(
+            list(records)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            record = self.catalog.load().by_id[int(self.kwargs['pk'])]
+        except (KeyError, ValueError):
+            raise NotFound
+        return (
+            self.get_not_modified_response(request)
+            or Response(self.catalog.to_representation(record))
+        )
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .pdf import font_available
+
+
+@register()
+def check_shopping_list_pdf_font(app_configs, **kwargs):
+    if font_available(settings.SHOPPING_LIST_PDF_FONT):
+        return []
+    return [Warning(
+        'Шрифт для PDF со списком покупок недоступен: '
+        f'{settings.SHOPPING_LIST_PDF_FONT}.',
+        hint='Укажите путь к шрифту TrueType в SHOPPING_LIST_PDF_FONT. '
+             'Пока шрифта нет, список покупок отдаётся в формате txt.',
+        id='api.W001',
+    )]
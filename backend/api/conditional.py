@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from http import HTTPStatus
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .versions import catalog_version_key, get_version
+
+NANOSECONDS_IN_SECOND = 10 ** 9
+
+
+class ConditionalGetMixin(ABC):
+    validators = None
+    vary_headers = ()
+
+    @abstractmethod
+    def get_validators(self):
+        pass
+
+    def get_not_modified_response(self, request):
+        self.validators = self.get_validators()
+        if self.validators is None:
+            return None
+        etag, last_modified = self.validators
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.validators is None or response.status_code not in (
+            HTTPStatus.OK, HTTPStatus.NOT_MODIFIED
+        ):
+            return response
+        etag, last_modified = self.validators
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, self.vary_headers)
+        return response
+
+
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+
+    def get_validators(self):
+        model = self.queryset.model
+        version = get_version(catalog_version_key(model))
+        return (
+            quote_etag(f'{model._meta.model_name}-{version}'),
+            version // NANOSECONDS_IN_SECOND,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return (
+            self.get_not_modified_response(request)
+            or super().list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return (
+            self.get_not_modified_response(request)
+            or super().retrieve(request, *args, **kwargs)
+        )
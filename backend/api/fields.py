@@ -0,0 +1,213 @@
+import binascii
+import warnings
+from base64 import b64decode
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recipes.images import SOURCE_KEY
+
+# Длина кратна четырём, чтобы каждый кусок декодировался отдельно.
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_SEPARATOR = ';base64,'
+IMAGE_HEADER_LIMIT = 1024 * 1024
+IMAGE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+ERROR_INVALID_IMAGE = 'Загрузите корректное изображение'
+ERROR_IMAGE_FORMAT = 'Формат изображения не поддерживается'
+ERROR_IMAGE_SIZE = 'Размер изображения не должен превышать {max_size} байт'
+ERROR_IMAGE_DIMENSIONS = (
+    'Стороны изображения не должны превышать {max_dimension} пикселей'
+)
+ERROR_DOES_NOT_EXIST_MANY = 'Не найдены объекты с id: {pk_values}'
+
+# Стороны изображения проверяет check_header, а предупреждение Pillow
+# о слишком большом изображении становится ошибкой при любом значении
+# Image.MAX_IMAGE_PIXELS.
+warnings.simplefilter('error', Image.DecompressionBombWarning)
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_image': ERROR_INVALID_IMAGE,
+        'image_format': ERROR_IMAGE_FORMAT,
+        'image_size': ERROR_IMAGE_SIZE,
+        'image_dimensions': ERROR_IMAGE_DIMENSIONS,
+    }
+
+    def __init__(self, *args, max_size=None, max_dimension=None, **kwargs):
+        self.max_size = max_size
+        self.max_dimension = max_dimension
+        super().__init__(*args, **kwargs)
+
+    def fail_dimensions(self):
+        self.fail(
+            'image_dimensions',
+            max_dimension=(
+                self.max_dimension or settings.IMAGE_UPLOAD_MAX_DIMENSION
+            ),
+        )
+
+    def check_header(self, image):
+        if image.format not in IMAGE_EXTENSIONS:
+            self.fail('image_format')
+        if max(image.size) > (
+            self.max_dimension or settings.IMAGE_UPLOAD_MAX_DIMENSION
+        ):
+            self.fail_dimensions()
+
+    def decode(self, data, offset, file):
+        header = b''
+        image_format = None
+        for start in range(offset, len(data), BASE64_CHUNK_SIZE):
+            try:
+                chunk = b64decode(
+                    data[start:start + BASE64_CHUNK_SIZE], validate=True
+                )
+            except (binascii.Error, ValueError):
+                self.fail('invalid_image')
+            file.write(chunk)
+            if image_format is None:
+                if len(header) > IMAGE_HEADER_LIMIT:
+                    self.fail('invalid_image')
+                header += chunk
+                try:
+                    image = Image.open(BytesIO(header))
+                except (
+                    Image.DecompressionBombError,
+                    Image.DecompressionBombWarning,
+                ):
+                    self.fail_dimensions()
+                except OSError:
+                    continue
+                self.check_header(image)
+                image_format = image.format
+        if image_format is None:
+            self.fail('invalid_image')
+        return image_format
+
+    def to_internal_value(self, data):
+        if not data:
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid')
+        # Срез строки после заголовка data URI скопировал бы её целиком.
+        offset = data.find(BASE64_SEPARATOR)
+        offset = 0 if offset == -1 else offset + len(BASE64_SEPARATOR)
+        max_size = self.max_size or settings.IMAGE_UPLOAD_MAX_SIZE
+        if (len(data) - offset) // 4 * 3 > max_size:
+            self.fail('image_size', max_size=max_size)
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image_format = self.decode(data, offset, file)
+        size = file.tell()
+        file.seek(0)
+        try:
+            Image.open(file).verify()
+        except Exception:
+            self.fail('invalid_image')
+        file.seek(0)
+        return InMemoryUploadedFile(
+            file=file,
+            field_name=self.field_name,
+            name=f'{uuid4()}.{IMAGE_EXTENSIONS[image_format]}',
+            content_type=Image.MIME[image_format],
+            size=size,
+            charset=None,
+        )
+
+
+def get_renditions_urls(renditions, request=None):
+    return {
+        rendition: {
+            extension: (
+                request.build_absolute_uri(default_storage.url(name))
+                if request is not None
+                else default_storage.url(name)
+            )
+            for extension, name in files.items()
+        }
+        for rendition, files in renditions.items()
+        if rendition != SOURCE_KEY
+    }
+
+
+class RenditionsField(serializers.ReadOnlyField):
+
+    def to_representation(self, renditions):
+        return get_renditions_urls(renditions, self.context.get('request'))
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    default_error_messages = {
+        'does_not_exist_many': ERROR_DOES_NOT_EXIST_MANY,
+    }
+
+    def __init__(self, *args, catalog=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog = catalog
+        self.resolved = {}
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        return BulkManyRelatedField(
+            child_relation=cls(*args, **kwargs),
+            **{
+                key: value for key, value in kwargs.items()
+                if key in MANY_RELATION_KWARGS
+            },
+        )
+
+    def to_pk(self, data):
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def resolve(self, data):
+        # Все id проверяются одним запросом, а в ошибке перечисляются
+        # все ненайденные.
+        pks = [self.to_pk(item) for item in data]
+        if self.catalog is None:
+            self.resolved = self.get_queryset().in_bulk(set(pks))
+        else:
+            records = self.catalog.load(self.context).by_id
+            self.resolved = {
+                pk: records[pk] for pk in set(pks) if pk in records
+            }
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in self.resolved]
+        if missing:
+            self.fail(
+                'does_not_exist_many',
+                pk_values=', '.join(map(str, missing)),
+            )
+        return [self.resolved[pk] for pk in pks]
+
+    def to_internal_value(self, data):
+        resolved = self.resolved.get(self.to_pk(data))
+        if resolved is not None:
+            return resolved
+        return super().to_internal_value(data)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.resolve(data)
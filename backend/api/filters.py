@@ -1,11 +1,26 @@
+from django.db.models import Count
+from django.db.models.functions import Lower
 from django_filters import rest_framework as filter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+from .catalog import tag_catalog
+
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+TAGS_MODES = (
+    (TAGS_MODE_ANY, 'Любой из ярлыков'),
+    (TAGS_MODE_ALL, 'Все ярлыки'),
+)
+
+
+def tag_slug_choices():
+    return [(slug, slug) for slug in tag_catalog.load().by_slug]
 
 
 class IngredientFilter(filter.FilterSet):
 
-    name = filter.CharFilter(lookup_expr='istartswith')
+    name = filter.CharFilter(method='name_filter')
 
     class Meta:
         model = Ingredient
@@ -13,13 +28,22 @@ class IngredientFilter(filter.FilterSet):
             'name',
         )
 
+    def name_filter(self, ingredients, name, value):
+        return ingredients.annotate(
+            name_lower=Lower('name')
+        ).filter(name_lower__startswith=value.lower())
+
 
 class RecipeFilter(filter.FilterSet):
 
-    tags = filter.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
+    tags = filter.MultipleChoiceFilter(
+        choices=tag_slug_choices,
+        method='tags_filter',
+    )
+
+    tags_mode = filter.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='tags_mode_filter',
     )
 
     is_in_shopping_cart = filter.BooleanFilter(
@@ -30,15 +54,45 @@ class RecipeFilter(filter.FilterSet):
         method='is_in_favs_filter'
     )
 
+    search = filter.CharFilter(
+        method='search_filter'
+    )
+
+    ordering = filter.OrderingFilter(
+        fields=('pub_date', 'favorites_count', 'shopping_carts_count')
+    )
+
     class Meta:
         model = Recipe
         fields = (
             'author',
             'tags',
+            'tags_mode',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
+            'ordering',
         )
 
+    def tags_filter(self, recipes, name, slugs):
+        # Полусоединение по индексу (tag_id, recipe_id) вместо JOIN:
+        # рецепты не дублируются и DISTINCT не нужен.
+        slugs = set(slugs)
+        tags = tag_catalog.load().by_slug
+        tag_ids = [tags[slug].id for slug in slugs if slug in tags]
+        recipe_tags = Recipe.tags.through.objects.filter(
+            tag_id__in=tag_ids
+        ).values('recipe_id')
+        if self.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL:
+            recipe_tags = recipe_tags.annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(slugs)).values('recipe_id')
+        return recipes.filter(id__in=recipe_tags)
+
+    def tags_mode_filter(self, recipes, name, value):
+        # Режим учитывается в tags_filter.
+        return recipes
+
     def is_in_shopping_cart_filter(self, recipes, name, value):
         if value and self.request.user.is_authenticated:
             return recipes.filter(shoppingcarts__user=self.request.user)
@@ -48,3 +102,6 @@ class RecipeFilter(filter.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(favoriterecipes__user=self.request.user)
         return queryset
+
+    def search_filter(self, recipes, name, value):
+        return search_recipes(recipes, value)
@@ -0,0 +1,68 @@
+from timeit import repeat
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from ...renderers import FastJSONRenderer
+
+COMMAND_HELP = '''benchmark_renderers - получает данные ответа на GET-запрос
+                и сравнивает время их кодирования JSONRenderer из DRF
+                и FastJSONRenderer. Время всего запроса с каждым из них
+                можно сравнить командой benchmark_requests, запустив её
+                с FAST_JSON=True и FAST_JSON=False в окружении:
+                классы из REST_FRAMEWORK читаются при старте.
+                '''
+URL_HELP = 'Путь запроса, например /api/ingredients/.'
+REPEAT_HELP = 'Сколько раз повторить замер; берётся лучший результат.'
+NUMBER_HELP = 'Сколько раз кодировать ответ в одном замере.'
+ERROR_STATUS = 'Запрос {url} вернул {status}'
+REPORT = (
+    'Размер ответа: {size} байт\n'
+    'JSONRenderer: {stock:.2f} мс, {stock_speed:.0f} МБ/с\n'
+    'FastJSONRenderer: {fast:.2f} мс, {fast_speed:.0f} МБ/с ({ratio:.1f}x)'
+)
+BYTES_IN_MEGABYTE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help=URL_HELP)
+        parser.add_argument('--repeat', type=int, default=5, help=REPEAT_HELP)
+        parser.add_argument(
+            '--number', type=int, default=100, help=NUMBER_HELP
+        )
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=next(
+            (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+            'localhost',
+        ))
+        url = options['url']
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(ERROR_STATUS.format(
+                url=url, status=response.status_code
+            ))
+        data = response.data
+        size = len(JSONRenderer().render(data))
+        stock, fast = (
+            min(repeat(
+                lambda: renderer.render(data),
+                number=options['number'],
+                repeat=options['repeat'],
+            )) * 1000 / options['number']
+            for renderer in (JSONRenderer(), FastJSONRenderer())
+        )
+        self.stdout.write(REPORT.format(
+            size=size,
+            stock=stock,
+            stock_speed=size / BYTES_IN_MEGABYTE / stock * 1000,
+            fast=fast,
+            fast_speed=size / BYTES_IN_MEGABYTE / fast * 1000,
+            ratio=stock / fast if fast else 0,
+        ))
@@ -0,0 +1,62 @@
+from timeit import repeat
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from ...serializers import RecipeSafeSerializer, RecipeSerializer
+
+COMMAND_HELP = '''benchmark_representations - сравнивает время сборки
+                представлений рецептов сериализатором DRF и из строк
+                values(), которыми пользуются списки. Кэш представлений
+                не используется, запросы к базе данных учитываются.
+                '''
+RECIPES_HELP = 'Сколько последних рецептов собирать за один проход.'
+REPEAT_HELP = 'Сколько раз повторить замер; берётся лучший результат.'
+REPORT = (
+    'Рецептов: {count}\n'
+    'Сериализатор: {serializer:.1f} мс\n'
+    'Строки values(): {rows:.1f} мс ({ratio:.1f}x)'
+)
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100, help=RECIPES_HELP
+        )
+        parser.add_argument('--repeat', type=int, default=5, help=REPEAT_HELP)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.with_related(AnonymousUser())
+        recipe_ids = list(
+            recipes.values_list('id', flat=True)[:options['recipes']]
+        )
+        recipes = recipes.filter(id__in=recipe_ids)
+
+        def serialize():
+            return RecipeSafeSerializer(
+                recipes.prefetch_related(
+                    'tags', 'recipes_ingredients__ingredient'
+                ),
+                many=True,
+                context={},
+            ).data
+
+        def build_rows():
+            return RecipeSerializer(context={}).build_representations(
+                recipe_ids
+            )
+
+        serializer, rows = (
+            min(repeat(run, number=1, repeat=options['repeat'])) * 1000
+            for run in (serialize, build_rows)
+        )
+        self.stdout.write(REPORT.format(
+            count=len(recipe_ids),
+            serializer=serializer,
+            rows=rows,
+            ratio=serializer / rows if rows else 0,
+        ))
@@ -0,0 +1,81 @@
+from ast import literal_eval
+from time import perf_counter, process_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+COMMAND_HELP = '''benchmark_requests - выполняет GET-запросы внутри процесса,
+                без HTTP-сервера, и выводит процессорное и полное время
+                одного запроса. Первый запрос прогревает кэши и не
+                учитывается, кэш ответов для анонимов отключён.
+                Изменения можно сравнить, переопределив
+                настройки, например
+                --setting RECIPE_REPRESENTATION_CACHE_TIMEOUT=0.
+                '''
+URL_HELP = 'Путь запроса, например /api/recipes/?limit=50.'
+REPEAT_HELP = 'Сколько запросов выполнить.'
+TOKEN_HELP = 'Токен пользователя, от имени которого идут запросы.'
+SETTING_HELP = 'Переопределить настройку: ИМЯ=ЗНАЧЕНИЕ. Можно повторять.'
+ERROR_SETTING = 'Ожидается ИМЯ=ЗНАЧЕНИЕ, получено {setting}'
+ERROR_STATUS = 'Запрос {url} вернул {status}'
+REPORT = (
+    'Запросов: {requests}\n'
+    'Процессорное время: {cpu:.1f} мс на запрос\n'
+    'Полное время: {wall:.1f} мс на запрос'
+)
+
+
+def parse_setting(setting):
+    name, separator, value = setting.partition('=')
+    if not separator:
+        raise CommandError(ERROR_SETTING.format(setting=setting))
+    try:
+        return name, literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help=URL_HELP)
+        parser.add_argument(
+            '--repeat', type=int, default=50, help=REPEAT_HELP
+        )
+        parser.add_argument('--token', help=TOKEN_HELP)
+        parser.add_argument(
+            '--setting', action='append', default=[], help=SETTING_HELP
+        )
+
+    def handle(self, *args, **options):
+        headers = {'HTTP_HOST': next(
+            (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+            'localhost',
+        )}
+        if options['token']:
+            headers['HTTP_AUTHORIZATION'] = f'Token {options["token"]}'
+        client = Client(**headers)
+        url = options['url']
+        # Кэш ответов для анонимов отдал бы повторные запросы целиком.
+        overrides = {
+            'RESPONSE_CACHE_TIMEOUT': 0,
+            **dict(map(parse_setting, options['setting'])),
+        }
+        with override_settings(**overrides):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(ERROR_STATUS.format(
+                    url=url, status=response.status_code
+                ))
+            cpu_started, wall_started = process_time(), perf_counter()
+            for _ in range(options['repeat']):
+                client.get(url)
+            cpu = process_time() - cpu_started
+            wall = perf_counter() - wall_started
+        self.stdout.write(REPORT.format(
+            requests=options['repeat'],
+            cpu=cpu * 1000 / options['repeat'],
+            wall=wall * 1000 / options['repeat'],
+        ))
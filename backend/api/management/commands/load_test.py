@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+COMMAND_HELP = '''load_test - отправляет на адрес параллельные GET-запросы
+                и выводит пропускную способность и задержки. Нужен для
+                сравнения режимов SERVER_MODE=wsgi и SERVER_MODE=asgi.
+                '''
+URL_HELP = 'Адрес, например http://localhost:8000/api/recipes/?limit=6.'
+REQUESTS_HELP = 'Сколько запросов отправить.'
+CONCURRENCY_HELP = 'Сколько запросов выполнять одновременно.'
+TOKEN_HELP = 'Токен пользователя, от имени которого идут запросы.'
+TIMEOUT = 30
+REPORT = (
+    'Запросов: {requests}, ошибок: {errors}, '
+    'в секунду: {rps:.1f}\n'
+    'Задержка, мс: p50 — {p50:.1f}, p95 — {p95:.1f}, p99 — {p99:.1f}'
+)
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help=URL_HELP)
+        parser.add_argument(
+            '--requests', type=int, default=400, help=REQUESTS_HELP
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=32, help=CONCURRENCY_HELP
+        )
+        parser.add_argument('--token', help=TOKEN_HELP)
+
+    @staticmethod
+    def fetch(request):
+        started = perf_counter()
+        try:
+            with urlopen(request, timeout=TIMEOUT) as response:
+                response.read()
+                ok = response.status < 400
+        except (HTTPError, URLError, OSError):
+            ok = False
+        return ok, perf_counter() - started
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        requests = [
+            # Разные адреса, чтобы запросы не отдавал кэш ответов.
+            Request(
+                f'{options["url"]}'
+                f'{"&" if "?" in options["url"] else "?"}load_test={index}',
+                headers=headers,
+            )
+            for index in range(options['requests'])
+        ]
+        started = perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(self.fetch, requests))
+        elapsed = perf_counter() - started
+        latencies = sorted(latency * 1000 for _, latency in results)
+        p50, p95, p99 = (
+            quantiles(latencies, n=100)[index - 1] for index in (50, 95, 99)
+        ) if len(latencies) > 1 else latencies * 3
+        self.stdout.write(REPORT.format(
+            requests=len(results),
+            errors=sum(not ok for ok, _ in results),
+            rps=len(results) / elapsed,
+            p50=p50,
+            p95=p95,
+            p99=p99,
+        ))
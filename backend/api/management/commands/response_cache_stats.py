@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from ...response_cache import (
+    get_response_cache_stats, reset_response_cache_stats
+)
+
+COMMAND_HELP = '''response_cache_stats - выводит число попаданий и промахов
+                кэша ответов для анонимных пользователей.
+                '''
+RESET_HELP = 'Обнулить счётчики после вывода.'
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help=RESET_HELP)
+
+    def handle(self, *args, **options):
+        hits, misses = get_response_cache_stats()
+        total = hits + misses
+        self.stdout.write(
+            f'Попаданий: {hits}, промахов: {misses}, доля попаданий: '
+            f'{hits / total if total else 0:.1%}'
+        )
+        if options['reset']:
+            reset_response_cache_stats()
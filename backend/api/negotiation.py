@@ -0,0 +1,19 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class ShoppingListContentNegotiation(DefaultContentNegotiation):
+    # Клиенты по умолчанию присылают Accept: application/json, а формат
+    # файла выбирают через ?format=. Если Accept не подходит ни к одному
+    # формату, отдается запрошенный формат, а без него — первый, txt.
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format = format_suffix or request.query_params.get(
+                self.settings.URL_FORMAT_OVERRIDE
+            )
+            if format:
+                renderers = self.filter_renderers(renderers, format)
+            return renderers[0], renderers[0].media_type
@@ -1,6 +1,138 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+ERROR_INVALID_CURSOR = 'Некорректный курсор'
+TRUE_VALUES = ('1', 'true', 'True')
+MAX_BIGINT = 2 ** 63 - 1
+MIN_BIGINT = -2 ** 63
+
+
+class KeysetPagination(BasePagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def encode_cursor(self, instance):
+        position = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        return urlsafe_b64encode(
+            json.dumps(position, default=str).encode()
+        ).decode()
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+            # Число за пределами BIGINT дошло бы до базы и вызвало
+            # ошибку сервера.
+            if any(
+                isinstance(value, int)
+                and not MIN_BIGINT <= value <= MAX_BIGINT
+                for value in position
+            ):
+                raise ValueError
+        except (
+            TypeError, ValueError, OverflowError, DjangoValidationError
+        ):
+            raise ValidationError({'detail': ERROR_INVALID_CURSOR})
+        return position
+
+    def get_position_filter(self, position):
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = (
+            queryset.count()
+            if request.query_params.get(self.count_query_param)
+            in TRUE_VALUES
+            else None
+        )
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        page_size = self.get_page_size(request)
+        page = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        self.next_cursor = (
+            self.encode_cursor(page[page_size - 1])
+            if len(page) > page_size else None
+        )
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = None
+        response['results'] = data
+        return Response(response)
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    pagination_query_param = 'pagination'
+    keyset = None
+
+    def use_keyset(self, request, view):
+        return getattr(view, 'keyset_ordering', None) and (
+            KeysetPagination.cursor_query_param in request.query_params
+            or request.query_params.get(self.pagination_query_param)
+            == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request, view):
+            self.keyset = KeysetPagination(view.keyset_ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
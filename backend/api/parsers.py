@@ -0,0 +1,43 @@
+import codecs
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+def contains_float(data):
+    values = [data]
+    while values:
+        value = values.pop()
+        if isinstance(value, float):
+            return True
+        if isinstance(value, dict):
+            values.extend(value.values())
+        elif isinstance(value, list):
+            values.extend(value)
+    return False
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        try:
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            # orjson читает целые больше 64 бит как float, поэтому запрос
+            # с дробными числами разбирается заново, как и ошибочный:
+            # json даёт прежний текст ошибки и точные большие целые.
+            if not contains_float(data):
+                return data
+        return super().parse(BytesIO(content), media_type, parser_context)
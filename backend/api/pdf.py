@@ -0,0 +1,424 @@
+import zlib
+from functools import lru_cache
+from struct import error as StructError, pack, unpack_from
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 50
+FONT_SIZE = 12
+LINE_HEIGHT = 16
+PDF_UNITS_PER_EM = 1000
+BFCHAR_BLOCK_SIZE = 100
+# Таблицы, которые нужны шрифту TrueType внутри PDF.
+SUBSET_TABLES = (
+    'cvt ', 'fpgm', 'glyf', 'head', 'hhea', 'hmtx', 'loca', 'maxp', 'prep'
+)
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+CHECKSUM_MAGIC = 0xB1B0AFBA
+
+
+def table_checksum(data):
+    data += b'\0' * (-len(data) % 4)
+    return sum(unpack_from(f'>{len(data) // 4}I', data)) & 0xFFFFFFFF
+
+
+def build_font(tables):
+    tags = sorted(tables)
+    power = 1 << (len(tags).bit_length() - 1)
+    offset = 12 + 16 * len(tags)
+    records, body = [], []
+    for tag in tags:
+        data = tables[tag]
+        records.append(pack(
+            '>4sIII',
+            tag.encode('latin-1'),
+            table_checksum(data),
+            offset,
+            len(data),
+        ))
+        if tag == 'head':
+            head = offset
+        data += b'\0' * (-len(data) % 4)
+        body.append(data)
+        offset += len(data)
+    font = bytearray(
+        pack(
+            '>IHHHH',
+            0x00010000,
+            len(tags),
+            power * 16,
+            power.bit_length() - 1,
+            (len(tags) - power) * 16,
+        )
+        + b''.join(records)
+        + b''.join(body)
+    )
+    font[head + 8:head + 12] = pack(
+        '>I', (CHECKSUM_MAGIC - table_checksum(bytes(font))) & 0xFFFFFFFF
+    )
+    return bytes(font)
+
+
+class TrueTypeFont:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = file.read()
+        self.tables = {}
+        for index in range(unpack_from('>H', self.data, 4)[0]):
+            tag, _, offset, length = unpack_from(
+                '>4sIII', self.data, 12 + index * 16
+            )
+            self.tables[tag.decode('latin-1')] = (offset, length)
+        tables = {tag: offset for tag, (offset, _) in self.tables.items()}
+        head, hhea = tables['head'], tables['hhea']
+        self.units_per_em = unpack_from('>H', self.data, head + 18)[0]
+        self.bbox = [
+            self.scale(value)
+            for value in unpack_from('>hhhh', self.data, head + 36)
+        ]
+        ascent, descent = unpack_from('>hh', self.data, hhea + 4)
+        self.ascent, self.descent = self.scale(ascent), self.scale(descent)
+        metrics_count = unpack_from('>H', self.data, hhea + 34)[0]
+        self.widths = [
+            unpack_from('>H', self.data, tables['hmtx'] + index * 4)[0]
+            for index in range(metrics_count)
+        ]
+        self.cmap = self.read_cmap(tables['cmap'])
+        glyphs_count = unpack_from('>H', self.data, tables['maxp'] + 4)[0]
+        if unpack_from('>h', self.data, head + 50)[0]:
+            locations = unpack_from(
+                f'>{glyphs_count + 1}I', self.data, tables['loca']
+            )
+        else:
+            locations = [
+                location * 2 for location in unpack_from(
+                    f'>{glyphs_count + 1}H', self.data, tables['loca']
+                )
+            ]
+        self.locations = [tables['glyf'] + location for location in locations]
+
+    def scale(self, value):
+        return value * PDF_UNITS_PER_EM // self.units_per_em
+
+    def read_cmap(self, cmap):
+        for index in range(unpack_from('>H', self.data, cmap + 2)[0]):
+            platform, encoding, offset = unpack_from(
+                '>HHI', self.data, cmap + 4 + index * 8
+            )
+            table = cmap + offset
+            if (
+                (platform, encoding) == (3, 1)
+                and unpack_from('>H', self.data, table)[0] == 4
+            ):
+                return self.read_cmap_format_4(table)
+        raise ValueError('В шрифте нет таблицы символов Unicode')
+
+    def read_cmap_format_4(self, table):
+        segments = unpack_from('>H', self.data, table + 6)[0] // 2
+        ends = table + 14
+        starts = ends + segments * 2 + 2
+        deltas = starts + segments * 2
+        range_offsets = deltas + segments * 2
+        cmap = {}
+        for segment in range(segments):
+            end = unpack_from('>H', self.data, ends + segment * 2)[0]
+            start = unpack_from('>H', self.data, starts + segment * 2)[0]
+            delta = unpack_from('>H', self.data, deltas + segment * 2)[0]
+            range_offset_address = range_offsets + segment * 2
+            range_offset = unpack_from(
+                '>H', self.data, range_offset_address
+            )[0]
+            for code in range(start, min(end, 0xFFFE) + 1):
+                if range_offset:
+                    glyph = unpack_from(
+                        '>H',
+                        self.data,
+                        range_offset_address
+                        + range_offset
+                        + (code - start) * 2
+                    )[0]
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+                else:
+                    glyph = (code + delta) & 0xFFFF
+                if glyph:
+                    cmap[code] = glyph
+        return cmap
+
+    def glyph_data(self, glyph):
+        return self.data[self.locations[glyph]:self.locations[glyph + 1]]
+
+    @staticmethod
+    def components(data):
+        # Составной глиф ссылается на другие глифы, их тоже нужно сохранить.
+        if not data or unpack_from('>h', data)[0] >= 0:
+            return
+        position = 10
+        while True:
+            flags, glyph = unpack_from('>HH', data, position)
+            yield glyph
+            position += 8 if flags & ARG_1_AND_2_ARE_WORDS else 6
+            if flags & WE_HAVE_A_SCALE:
+                position += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                position += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                position += 8
+            if not flags & MORE_COMPONENTS:
+                return
+
+    def subset(self, glyphs):
+        # Номера глифов не меняются, у неиспользуемых просто нет контуров,
+        # поэтому CIDToGIDMap остаётся /Identity.
+        glyphs_count = len(self.locations) - 1
+        kept = set()
+        pending = [0, *glyphs]
+        while pending:
+            glyph = pending.pop()
+            if glyph in kept or glyph >= glyphs_count:
+                continue
+            kept.add(glyph)
+            pending.extend(self.components(self.glyph_data(glyph)))
+        glyf = bytearray()
+        locations = []
+        for glyph in range(glyphs_count):
+            locations.append(len(glyf))
+            if glyph in kept:
+                glyf += self.glyph_data(glyph)
+                glyf += b'\0' * (-len(glyf) % 4)
+        locations.append(len(glyf))
+        tables = {
+            tag: self.data[offset:offset + length]
+            for tag, (offset, length) in self.tables.items()
+            if tag in SUBSET_TABLES
+        }
+        head = bytearray(tables['head'])
+        head[8:12] = bytes(4)
+        head[50:52] = pack('>h', 1)
+        tables.update(
+            head=bytes(head),
+            glyf=bytes(glyf),
+            loca=pack(f'>{len(locations)}I', *locations),
+        )
+        return build_font(tables)
+
+    def glyph(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def width(self, glyph):
+        return self.scale(self.widths[min(glyph, len(self.widths) - 1)])
+
+    def text_width(self, text):
+        return sum(
+            self.width(self.glyph(char)) for char in text
+        ) * FONT_SIZE / PDF_UNITS_PER_EM
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    return TrueTypeFont(path)
+
+
+def font_available(path):
+    try:
+        load_font(path)
+    except (OSError, ValueError, KeyError, StructError):
+        return False
+    return True
+
+
+def wrap_line(font, line, max_width):
+    words = line.split(' ')
+    current = words[0]
+    for word in words[1:]:
+        candidate = f'{current} {word}'
+        if font.text_width(candidate) > max_width:
+            yield current
+            current = word
+        else:
+            current = candidate
+    yield current
+
+
+class PdfWriter:
+    def __init__(self, font):
+        self.font = font
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.used_glyphs = {}
+        self.objects_count = 0
+
+    def reserve(self):
+        self.objects_count += 1
+        return self.objects_count
+
+    def write(self, chunk):
+        self.offset += len(chunk)
+        return chunk
+
+    def write_object(self, number, body, stream=None):
+        self.offsets[number] = self.offset
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        return self.write(chunk + b'\nendobj\n')
+
+    def encode_text(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyph(char)
+            self.used_glyphs[glyph] = char
+            glyphs.append(f'{glyph:04X}')
+        return ''.join(glyphs)
+
+    def render_page(self, lines):
+        content = [
+            'BT',
+            f'/F1 {FONT_SIZE} Tf',
+            f'{LINE_HEIGHT} TL',
+            f'{PAGE_MARGIN} {PAGE_HEIGHT - PAGE_MARGIN} Td',
+        ]
+        content.extend(f'<{self.encode_text(line)}> Tj T*' for line in lines)
+        content.append('ET')
+        content = '\n'.join(content).encode()
+        page, contents = self.reserve(), self.reserve()
+        self.pages.append(page)
+        return self.write_object(
+            contents,
+            f'<< /Length {len(content)} >>'.encode(),
+            content,
+        ) + self.write_object(
+            page,
+            (
+                f'<< /Type /Page /Parent {self.pages_number} 0 R'
+                f' /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]'
+                f' /Resources << /Font << /F1 {self.font_number} 0 R >> >>'
+                f' /Contents {contents} 0 R >>'
+            ).encode(),
+        )
+
+    def render_font(self):
+        font = self.font
+        descendant, descriptor = self.reserve(), self.reserve()
+        font_file, to_unicode = self.reserve(), self.reserve()
+        font_data = font.subset(self.used_glyphs)
+        compressed_font_data = zlib.compress(font_data)
+        widths = ' '.join(
+            f'{glyph} [{font.width(glyph)}]'
+            for glyph in sorted(self.used_glyphs)
+        )
+        mapping = [
+            f'<{glyph:04X}> <{ord(char):04X}>'
+            for glyph, char in sorted(self.used_glyphs.items())
+        ]
+        unicode_map = ''.join(
+            f'{len(block)} beginbfchar\n' + '\n'.join(block) + '\nendbfchar\n'
+            for block in (
+                mapping[start:start + BFCHAR_BLOCK_SIZE]
+                for start in range(0, len(mapping), BFCHAR_BLOCK_SIZE)
+            )
+        )
+        to_unicode_stream = (
+            '/CIDInit /ProcSet findresource begin\n'
+            '12 dict begin\nbegincmap\n'
+            '/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+            '1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+            f'{unicode_map}'
+            'endcmap\nCMapName currentdict /CMap defineresource pop\n'
+            'end\nend'
+        ).encode()
+        yield self.write_object(
+            self.font_number,
+            (
+                '<< /Type /Font /Subtype /Type0 /BaseFont /EmbeddedFont'
+                f' /Encoding /Identity-H /DescendantFonts [{descendant} 0 R]'
+                f' /ToUnicode {to_unicode} 0 R >>'
+            ).encode(),
+        )
+        yield self.write_object(
+            descendant,
+            (
+                '<< /Type /Font /Subtype /CIDFontType2'
+                ' /BaseFont /EmbeddedFont'
+                ' /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity)'
+                ' /Supplement 0 >>'
+                f' /FontDescriptor {descriptor} 0 R'
+                f' /CIDToGIDMap /Identity /W [{widths}] >>'
+            ).encode(),
+        )
+        yield self.write_object(
+            descriptor,
+            (
+                '<< /Type /FontDescriptor /FontName /EmbeddedFont /Flags 32'
+                f' /FontBBox [{" ".join(map(str, font.bbox))}]'
+                f' /ItalicAngle 0 /Ascent {font.ascent}'
+                f' /Descent {font.descent} /CapHeight {font.ascent}'
+                f' /StemV 80 /FontFile2 {font_file} 0 R >>'
+            ).encode(),
+        )
+        yield self.write_object(
+            font_file,
+            (
+                f'<< /Length {len(compressed_font_data)}'
+                f' /Length1 {len(font_data)} /Filter /FlateDecode >>'
+            ).encode(),
+            compressed_font_data,
+        )
+        yield self.write_object(
+            to_unicode,
+            f'<< /Length {len(to_unicode_stream)} >>'.encode(),
+            to_unicode_stream,
+        )
+
+    def render(self, lines):
+        self.catalog_number = self.reserve()
+        self.pages_number = self.reserve()
+        self.font_number = self.reserve()
+        yield self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        lines_per_page = (PAGE_HEIGHT - 2 * PAGE_MARGIN) // LINE_HEIGHT
+        max_width = PAGE_WIDTH - 2 * PAGE_MARGIN
+        page = []
+        for line in lines:
+            for wrapped in wrap_line(self.font, line, max_width):
+                page.append(wrapped)
+                if len(page) == lines_per_page:
+                    yield self.render_page(page)
+                    page = []
+        if page or not self.pages:
+            yield self.render_page(page)
+        yield from self.render_font()
+        yield self.write_object(
+            self.pages_number,
+            (
+                '<< /Type /Pages /Kids'
+                f' [{" ".join(f"{page} 0 R" for page in self.pages)}]'
+                f' /Count {len(self.pages)} >>'
+            ).encode(),
+        )
+        yield self.write_object(
+            self.catalog_number,
+            f'<< /Type /Catalog /Pages {self.pages_number} 0 R >>'.encode(),
+        )
+        xref_offset = self.offset
+        yield self.write(
+            (
+                f'xref\n0 {self.objects_count + 1}\n'
+                '0000000000 65535 f \n'
+                + ''.join(
+                    f'{self.offsets[number]:010d} 00000 n \n'
+                    for number in range(1, self.objects_count + 1)
+                )
+                + f'trailer\n<< /Size {self.objects_count + 1}'
+                f' /Root {self.catalog_number} 0 R >>\n'
+                f'startxref\n{xref_offset}\n%%EOF\n'
+            ).encode()
+        )
+
+
+def generate_pdf(lines, font_path):
+    return PdfWriter(load_font(font_path)).render(lines)
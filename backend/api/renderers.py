@@ -0,0 +1,80 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+) if orjson else 0
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Компактный ответ кодируется через orjson. Даты и прочие типы, которые
+    # orjson выводит иначе, передаются кодировщику DRF, поэтому байты
+    # ответа совпадают с JSONRenderer. С отступами, без orjson и для того,
+    # что orjson не умеет (например, очень большие целые), работает json.
+    # Отличаются только обычные float: в экспоненциальной записи orjson
+    # пишет 1e-7 вместо 1e-07, а NaN выводит как null без ошибки.
+
+    def default(self, value):
+        value = self.encoder_class().default(value)
+        if isinstance(value, float):
+            # Decimal кодировщик DRF превращает в float: он выводится так же,
+            # как в json, включая экспоненциальную запись.
+            return orjson.Fragment(
+                json.dumps(value, allow_nan=not self.strict).encode()
+            )
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(
+                accepted_media_type, renderer_context or {}
+            ) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            content = content.replace(separator, escaped)
+        return content
+
+
+class ShoppingListRenderer(JSONRenderer):
+    charset = 'utf-8'
+
+
+class TxtShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CsvShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PdfShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
@@ -0,0 +1,115 @@
+from hashlib import md5
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+from .versions import bump_versions, get_version, response_cache_version_key
+
+RESPONSE_CACHE_HITS_KEY = 'response_cache_stats:hits'
+RESPONSE_CACHE_MISSES_KEY = 'response_cache_stats:misses'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow')
+
+
+def increment_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_response_cache_stats():
+    stats = cache.get_many(
+        (RESPONSE_CACHE_HITS_KEY, RESPONSE_CACHE_MISSES_KEY)
+    )
+    return (
+        stats.get(RESPONSE_CACHE_HITS_KEY, 0),
+        stats.get(RESPONSE_CACHE_MISSES_KEY, 0),
+    )
+
+
+def reset_response_cache_stats():
+    cache.delete_many((RESPONSE_CACHE_HITS_KEY, RESPONSE_CACHE_MISSES_KEY))
+
+
+def invalidate_response_cache(*tags):
+    keys = [response_cache_version_key(tag) for tag in tags]
+    transaction.on_commit(lambda: bump_versions(*keys))
+
+
+class AnonymousResponseCacheMixin:
+    response_cache_tags = ()
+    response_cache_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        if (
+            not settings.RESPONSE_CACHE_TIMEOUT
+            or request.method != 'GET'
+            or 'HTTP_AUTHORIZATION' in request.META
+            or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+            or self.action_map.get('get') not in self.response_cache_actions
+        ):
+            return None
+        params = urlencode(sorted(
+            (name, value)
+            for name in request.GET
+            for value in request.GET.getlist(name)
+        ))
+        versions = ':'.join(
+            str(get_version(response_cache_version_key(tag)))
+            for tag in self.response_cache_tags
+        )
+        # Ответы содержат абсолютные ссылки на изображения, поэтому
+        # адрес сервера входит в ключ.
+        return 'response:' + md5(
+            f'{request.scheme}://{request.get_host()}{request.path}'
+            f'?{params}:{versions}'.encode()
+        ).hexdigest()
+
+    @staticmethod
+    def get_cached_response(request, content, headers):
+        response = HttpResponse(content)
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+        return get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(headers.get('Last-Modified')),
+            response=response,
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            increment_counter(RESPONSE_CACHE_HITS_KEY)
+            return self.get_cached_response(request, *cached)
+        increment_counter(RESPONSE_CACHE_MISSES_KEY)
+        response = super().dispatch(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        renderer = getattr(response, 'accepted_renderer', None)
+        if (
+            response.status_code == HTTPStatus.OK
+            and getattr(renderer, 'format', None) == 'json'
+            and self.request.user.is_anonymous
+        ):
+            response.add_post_render_callback(lambda rendered: cache.set(
+                key,
+                (
+                    rendered.content,
+                    {
+                        header: rendered[header]
+                        for header in CACHED_HEADERS
+                        if rendered.has_header(header)
+                    },
+                ),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            ))
+        return response
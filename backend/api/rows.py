@@ -0,0 +1,33 @@
+from django.core.files.storage import default_storage
+
+
+def get_image_url(name, request=None):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class RowMapper:
+    # Превращает строку values() в словарь того же вида, что и вывод
+    # сериализатора, без создания его полей. Порядок ключей берётся из
+    # Meta.fields, а функции преобразования выбираются один раз.
+
+    def __init__(self, serializer_class, **converters):
+        self.fields = tuple(
+            (name, converters.get(name))
+            for name in serializer_class.Meta.fields
+        )
+        model_fields = {
+            field.name
+            for field in serializer_class.Meta.model._meta.concrete_fields
+        }
+        self.columns = tuple(
+            name for name, _ in self.fields if name in model_fields
+        )
+
+    def __call__(self, row, request=None):
+        return {
+            name: row[name] if convert is None else convert(row[name], request)
+            for name, convert in self.fields
+        }
@@ -1,11 +1,21 @@
-from sys import maxsize
+from collections import Counter
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.core.cache import cache
+from django.db import models, transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, serializers
 
+from .catalog import ingredient_catalog, tag_catalog
+from .fields import (
+    BulkPrimaryKeyRelatedField,
+    RenditionsField,
+    StreamingBase64ImageField,
+    get_renditions_urls,
+)
+from .rows import RowMapper, get_image_url
+
 from recipes.models import (
     FavoriteRecipe,
     ERROR_MORE_INGREDIENT,
@@ -14,10 +24,13 @@ from recipes.models import (
     Recipe,
     RecipeIngredient,
     ShoppingCart,
+    ShoppingCartIngredient,
     Subscription,
     Tag
 )
 
+from recipes.counters import shift_counter
+from recipes.search import update_search_documents
 from recipes.validators import validate_username
 
 MIN_INGREDIENTS_COUNT = 1
@@ -28,10 +41,13 @@ ERROR_NO_TAGS = 'У рещепта должны быть ярлыки'
 ERROR_DUPLICATE = 'Обнаружены дупликаты: {duplicates}'
 ERROR_ALREADY_IN_CART = 'Рецепт уже в корзине'
 ERROR_ALREADY_FAVED = 'Рецепт уже в избранных'
-ERROR_RECIPE_LIMIT_NOT_INT = 'recipe_limit должно быть целым числом'
 ERROR_EMPTY_BASE64IMAGE = 'Поле image не может быть пустым'
 TAG = 'Ярлык'
 INGREDIENT = 'Продукт'
+SEARCH_FIELDS = {'name', 'text'}
+RECIPE_REPRESENTATION_KEY = (
+    'recipe_representation:{id}:{updated_at}:{tags}:{ingredients}:{host}'
+)
 
 
 User = get_user_model()
@@ -50,6 +66,7 @@ def calculate_filter_object_exists(model, user, **kwargs):
 class UserSerializer(DjoserUserSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_renditions = RenditionsField()
 
     class Meta:
         model = User
@@ -57,12 +74,15 @@ class UserSerializer(DjoserUserSerializer):
             *DjoserUserSerializer.Meta.fields,
             'is_subscribed',
             'avatar',
+            'avatar_renditions',
         )
 
     def validate_username(self, username):
         return validate_username(username)
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         return calculate_filter_object_exists(
             model=Subscription,
             user=self.context['request'].user,
@@ -70,9 +90,16 @@ class UserSerializer(DjoserUserSerializer):
         )
 
 
+user_row = RowMapper(
+    UserSerializer,
+    avatar=get_image_url,
+    avatar_renditions=get_renditions_urls,
+)
+
+
 class UserAvatarSerializer(serializers.ModelSerializer):
 
-    avatar = Base64ImageField(required=True, allow_null=False)
+    avatar = StreamingBase64ImageField(required=True, allow_null=False)
 
     class Meta:
         model = User
@@ -85,21 +112,60 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'slug',
+        )
 
 
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+        )
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].resolve([
+                item['id'] for item in data
+                if isinstance(item, dict) and item.get('id') is not None
+            ])
+        return super().to_internal_value(data)
+
 
+class CatalogIngredientMixin:
+    # Название и единица измерения берутся из справочника в памяти,
+    # поэтому продукт не нужно подгружать вместе со строкой.
+
+    def to_representation(self, item):
+        ingredient = (
+            ingredient_catalog.load(self.context).by_id.get(item.ingredient_id)
+            or item.ingredient
+        )
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': item.amount,
+        }
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
 
-    id = serializers.PrimaryKeyRelatedField(
+class RecipeIngredientSerializer(
+    CatalogIngredientMixin, serializers.ModelSerializer
+):
+
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient.id',
+        catalog=ingredient_catalog,
     )
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
@@ -116,6 +182,27 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
         model = RecipeIngredient
+        list_serializer_class = RecipeIngredientListSerializer
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+            'amount',
+        )
+
+
+class ShoppingCartIngredientSerializer(
+    CatalogIngredientMixin, serializers.ModelSerializer
+):
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingCartIngredient
         fields = (
             'id',
             'name',
@@ -127,6 +214,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 class RecipeShortSafeSerializer(
     serializers.ModelSerializer
 ):
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Recipe
@@ -134,10 +222,18 @@ class RecipeShortSafeSerializer(
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time',
         )
 
 
+short_recipe_row = RowMapper(
+    RecipeShortSafeSerializer,
+    image=get_image_url,
+    image_renditions=get_renditions_urls,
+)
+
+
 class RecipeSafeSerializer(
     RecipeShortSafeSerializer
 ):
@@ -161,6 +257,8 @@ class RecipeSafeSerializer(
         )
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         return calculate_filter_object_exists(
             model=FavoriteRecipe,
             user=self.context['request'].user,
@@ -168,6 +266,8 @@ class RecipeSafeSerializer(
         )
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         return calculate_filter_object_exists(
             model=ShoppingCart,
             user=self.context['request'].user,
@@ -175,10 +275,25 @@ class RecipeSafeSerializer(
         )
 
 
+recipe_row = RowMapper(
+    RecipeSafeSerializer,
+    image=get_image_url,
+    image_renditions=get_renditions_urls,
+)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representations(list(recipes))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
+        catalog=tag_catalog,
         many=True,
     )
     author = serializers.PrimaryKeyRelatedField(
@@ -188,7 +303,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         source='recipes_ingredients', many=True, required=False
     )
-    image = Base64ImageField(required=True, allow_null=False)
+    image = StreamingBase64ImageField(required=True, allow_null=False)
 
     class Meta:
         model = Recipe
@@ -202,10 +317,13 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
 
     @staticmethod
     def find_duplicates(items, item_type):
-        duplicates = {item for item in items if items.count(item) > 1}
+        duplicates = {
+            item for item, count in Counter(items).items() if count > 1
+        }
         if duplicates:
             raise serializers.ValidationError(
                 {item_type: ERROR_DUPLICATE.format(duplicates=duplicates)}
@@ -218,14 +336,35 @@ class RecipeSerializer(serializers.ModelSerializer):
             })
         return image
 
+    @staticmethod
+    def shift_recipes_counters(model, added_ids, removed_ids):
+        shift_counter(
+            model.objects.filter(id__in=added_ids), 'recipes_count', 1
+        )
+        shift_counter(
+            model.objects.filter(id__in=removed_ids), 'recipes_count', -1
+        )
+
     def update_tags(self, recipe, tags):
         if not tags:
             raise exceptions.ValidationError(
                 ERROR_NO_TAGS
             )
         self.find_duplicates(tags, TAG)
-        recipe.tags.clear()
-        recipe.tags.set(tags)
+        # Связи пишутся в промежуточную таблицу напрямую: add() и remove()
+        # перечитывают существующие строки, а кэш ответов сбрасывается
+        # сохранением самого рецепта.
+        old_ids = set(recipe.tags.values_list('id', flat=True))
+        new_ids = {tag.id for tag in tags}
+        added_ids, removed_ids = new_ids - old_ids, old_ids - new_ids
+        RecipeTag = Recipe.tags.through
+        RecipeTag.objects.filter(
+            recipe=recipe, tag_id__in=removed_ids
+        ).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in added_ids
+        )
+        self.shift_recipes_counters(Tag, added_ids, removed_ids)
 
     def update_ingredients(self, recipe, ingredients):
         if not ingredients:
@@ -236,14 +375,50 @@ class RecipeSerializer(serializers.ModelSerializer):
             [ingredient['ingredient']['id'] for ingredient in ingredients],
             INGREDIENT
         )
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        RecipeIngredient.objects.bulk_create((
+        old_items = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient['ingredient']['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in old_items.items()
+        }
+        added_ids = amounts.keys() - old_items.keys()
+        removed_ids = old_items.keys() - amounts.keys()
+        changed_items = [
+            item for ingredient_id, item in old_items.items()
+            if ingredient_id in amounts
+            and item.amount != amounts[ingredient_id]
+        ]
+        for item in changed_items:
+            item.amount = amounts[item.ingredient_id]
+        RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient_id__in=removed_ids
+        ).delete()
+        RecipeIngredient.objects.bulk_update(changed_items, ('amount',))
+        RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=ingredient['ingredient']['id'],
-                amount=ingredient['amount'],
-            ) for ingredient in ingredients),
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id],
+            ) for ingredient_id in added_ids
         )
+        self.shift_recipes_counters(Ingredient, added_ids, removed_ids)
+        ShoppingCartIngredient.objects.shift_amounts(
+            recipe.shoppingcarts.values_list('user_id', flat=True),
+            {
+                ingredient_id: (
+                    amounts.get(ingredient_id, 0)
+                    - old_amounts.get(ingredient_id, 0)
+                )
+                for ingredient_id in amounts.keys() | old_amounts.keys()
+            },
+        )
+        return bool(added_ids or removed_ids)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -251,29 +426,151 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('recipes_ingredients', [])
         tags = validated_data.pop('tags', [])
         recipe = super().create(validated_data)
+        shift_counter(
+            User.objects.filter(id=recipe.author_id), 'recipes_count', 1
+        )
         self.update_tags(recipe, tags)
         self.update_ingredients(recipe, ingredients)
+        update_search_documents(Recipe.objects.filter(pk=recipe.pk))
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         validated_data['author'] = self.context['request'].user
-        ingredients = validated_data.pop('recipes_ingredients', [])
-        tags = validated_data.pop('tags', [])
-        self.update_tags(instance, tags)
-        self.update_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        # При частичном обновлении пропущенные ярлыки и продукты
+        # остаются прежними.
+        if 'tags' in validated_data or not self.partial:
+            self.update_tags(instance, validated_data.pop('tags', []))
+        ingredients_changed = (
+            ('recipes_ingredients' in validated_data or not self.partial)
+            and self.update_ingredients(
+                instance, validated_data.pop('recipes_ingredients', [])
+            )
+        )
+        search_changed = any(
+            getattr(instance, field) != validated_data[field]
+            for field in SEARCH_FIELDS & validated_data.keys()
+        )
+        recipe = super().update(instance, validated_data)
+        if ingredients_changed or search_changed:
+            update_search_documents(Recipe.objects.filter(pk=recipe.pk))
+        return recipe
+
+    def get_representation_key(self, recipe):
+        # Дата изменения рецепта обновляется и при изменении автора,
+        # ярлыков, продуктов и уменьшенных копий изображений. Версии
+        # справочников защищают от снимка, прочитанного до их обновления,
+        # а адрес сервера входит в абсолютные ссылки на изображения.
+        request = self.context.get('request')
+        return RECIPE_REPRESENTATION_KEY.format(
+            id=recipe.id,
+            updated_at=recipe.updated_at.timestamp(),
+            tags=tag_catalog.load(self.context).version,
+            ingredients=ingredient_catalog.load(self.context).version,
+            host=request.build_absolute_uri('/') if request else '',
+        )
+
+    def build_representations(self, recipe_ids):
+        # Рецепты, которых нет в кэше, читаются через values(), ярлыки
+        # и продукты берутся из справочников, а словари собираются без
+        # полей DRF. Флаги пользователя заполняются позже.
+        request = self.context.get('request')
+        recipes = {
+            row['id']: {
+                **row,
+                'tags': [],
+                'ingredients': [],
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+            }
+            for row in Recipe.objects.filter(
+                id__in=recipe_ids
+            ).values(*recipe_row.columns)
+        }
+        authors = {
+            row['id']: user_row({**row, 'is_subscribed': False}, request)
+            for row in User.objects.filter(
+                id__in={recipe['author'] for recipe in recipes.values()}
+            ).values(*user_row.columns)
+        }
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag').values_list('recipe_id', 'tag_id'):
+            recipes[recipe_id]['tags'].append(tag_catalog.to_representation(
+                tag_catalog.get(tag_id, self.context)
+            ))
+        for recipe_id, ingredient_id, amount in (
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id', 'amount')
+        ):
+            recipes[recipe_id]['ingredients'].append({
+                **ingredient_catalog.to_representation(
+                    ingredient_catalog.get(ingredient_id, self.context)
+                ),
+                'amount': amount,
+            })
+        return {
+            recipe_id: recipe_row(
+                {**recipe, 'author': authors[recipe['author']]},
+                request,
+            )
+            for recipe_id, recipe in recipes.items()
+        }
+
+    def to_representations(self, recipes):
+        # Общая для всех пользователей часть рецепта хранится в кэше
+        # словарём, а флаги пользователя добавляются при каждом ответе.
+        # Бэкенд кэша сериализует словари сам, и ответ кодируется в JSON
+        # один раз, в рендерере.
+        keys = {
+            recipe.id: self.get_representation_key(recipe)
+            for recipe in recipes
+        }
+        cached = cache.get_many(keys.values())
+        missing_ids = [
+            recipe.id for recipe in recipes if keys[recipe.id] not in cached
+        ]
+        if missing_ids:
+            missing = {
+                keys[recipe_id]: data
+                for recipe_id, data in self.build_representations(
+                    missing_ids
+                ).items()
+            }
+            cache.set_many(
+                missing, settings.RECIPE_REPRESENTATION_CACHE_TIMEOUT
+            )
+            cached.update(missing)
+        flags = RecipeSafeSerializer(context=self.context)
+        subscriptions = UserSerializer(context=self.context)
+        representations = []
+        for recipe in recipes:
+            # Только что собранные словари не скопированы кэшем, а автор
+            # у рецептов одного пользователя общий, поэтому флаги
+            # записываются в копии.
+            representations.append({
+                **cached[keys[recipe.id]],
+                'author': {
+                    **cached[keys[recipe.id]]['author'],
+                    'is_subscribed': subscriptions.get_is_subscribed(
+                        recipe.author
+                    ),
+                },
+                'is_favorited': flags.get_is_favorited(recipe),
+                'is_in_shopping_cart': flags.get_is_in_shopping_cart(recipe),
+            })
+        return representations
 
     def to_representation(self, instance):
-        return RecipeSafeSerializer(
-            instance,
-            context=self.context,
-        ).data
+        return self.to_representations([instance])[0]
 
 
 class SubscriptionSerializer(UserSerializer):
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes = RecipeShortSafeSerializer(
+        source='recipes_preview', many=True, read_only=True
+    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = (
@@ -282,22 +579,9 @@ class SubscriptionSerializer(UserSerializer):
             'recipes_count'
         )
 
-    def get_recipes(self, user):
-        try:
-            recipes_limit = int(
-                self.context.get(
-                    'request'
-                ).query_params.get('recipes_limit', maxsize)
-            )
-        except ValueError:
-            raise serializers.ValidationError(
-                {'detail': ERROR_RECIPE_LIMIT_NOT_INT}
-            )
-        return RecipeShortSafeSerializer(
-            user.recipes.all()[:recipes_limit],
-            context=self.context,
-            many=True
-        ).data
-
-    def get_recipes_count(self, user):
-        return user.recipes.count()
+
+subscription_row = RowMapper(
+    SubscriptionSerializer,
+    avatar=get_image_url,
+    avatar_renditions=get_renditions_urls,
+)
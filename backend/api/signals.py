@@ -0,0 +1,224 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Subscription,
+    Tag,
+)
+from recipes.images import (
+    delete_renditions,
+    get_renditions_field,
+    renditions_ready,
+    schedule_renditions,
+)
+from recipes.management.archive import recipes_imported
+from recipes.management.fill_command import catalog_imported
+from recipes.search import update_search_documents
+from .response_cache import invalidate_response_cache
+from .versions import (
+    bump_versions,
+    catalog_version_key,
+    recipe_feed_version_key,
+    shopping_cart_version_key,
+)
+
+User = get_user_model()
+
+
+def bump_versions_on_commit(key, user_ids):
+    keys = [key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: bump_versions(*keys))
+
+
+def bump_shopping_cart_versions(user_ids):
+    bump_versions_on_commit(shopping_cart_version_key, user_ids)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    bump_shopping_cart_versions((instance.user_id,))
+
+
+# Суммы продуктов в корзине сдвигаются при любом добавлении и удалении
+# рецепта: через API, в админке и каскадом при удалении рецепта или
+# пользователя. pre_delete приходит до удаления продуктов рецепта.
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    if created:
+        ShoppingCartIngredient.objects.shift_recipe(
+            (instance.user_id,), instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    ShoppingCartIngredient.objects.shift_recipe(
+        (instance.user_id,), instance.recipe_id, -1
+    )
+
+
+# Продукты рецепта меняются только вместе с самим рецептом (сериализатор,
+# инлайн в админке), а версия обновляется после коммита транзакции,
+# поэтому сохранения рецепта достаточно.
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_shopping_cart_versions(
+            instance.shoppingcarts.values_list('user_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_shopping_cart_versions(
+            ShoppingCart.objects.filter(
+                recipe__recipes_ingredients__ingredient=instance
+            ).values_list('user_id', flat=True).distinct()
+        )
+        update_search_documents(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    bump_versions_on_commit(recipe_feed_version_key, (instance.user_id,))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created=True, **kwargs):
+    if created:
+        bump_versions_on_commit(
+            recipe_feed_version_key,
+            Subscription.objects.filter(
+                author_id=instance.author_id
+            ).values_list('user_id', flat=True),
+        )
+
+
+@receiver(recipes_imported, sender=Recipe)
+def recipes_added(sender, author_ids, **kwargs):
+    bump_versions_on_commit(
+        recipe_feed_version_key,
+        Subscription.objects.filter(
+            author_id__in=author_ids
+        ).values_list('user_id', flat=True).distinct(),
+    )
+    invalidate_response_cache('recipes', 'users')
+
+
+@receiver((post_save, post_delete, catalog_imported), sender=Tag)
+@receiver((post_save, post_delete, catalog_imported), sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    key = catalog_version_key(sender)
+    transaction.on_commit(lambda: bump_versions(key))
+
+
+def touch_recipes(recipes):
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_touched(sender, instance, created=False, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(catalog_imported, sender=Tag)
+def tags_imported(sender, updated_ids, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags__in=updated_ids))
+
+
+@receiver(catalog_imported, sender=Ingredient)
+def ingredients_imported(sender, updated_ids, **kwargs):
+    recipes = Recipe.objects.filter(ingredients__in=updated_ids)
+    bump_shopping_cart_versions(
+        ShoppingCart.objects.filter(
+            recipe__in=recipes
+        ).values_list('user_id', flat=True).distinct()
+    )
+    touch_recipes(recipes)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_response_cache(sender, **kwargs):
+    invalidate_response_cache('recipes')
+
+
+@receiver((post_save, post_delete, catalog_imported), sender=Tag)
+def invalidate_tags_response_cache(sender, **kwargs):
+    invalidate_response_cache('tags', 'recipes')
+
+
+@receiver((post_save, post_delete, catalog_imported), sender=Ingredient)
+def invalidate_ingredients_response_cache(sender, **kwargs):
+    invalidate_response_cache('ingredients', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_users_response_cache(sender, instance, update_fields=None,
+                                    **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_response_cache('users', 'recipes')
+
+
+IMAGE_FIELDS = {
+    Recipe: 'image',
+    User: 'avatar',
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, **kwargs):
+    schedule_renditions(instance, IMAGE_FIELDS[sender])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def image_deleted(sender, instance, **kwargs):
+    field_name = IMAGE_FIELDS[sender]
+    storage = getattr(instance, field_name).storage
+    renditions = getattr(instance, get_renditions_field(field_name))
+    transaction.on_commit(lambda: delete_renditions(storage, renditions))
+
+
+@receiver(renditions_ready, sender=Recipe)
+def recipe_renditions_ready(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    invalidate_response_cache('recipes')
+
+
+@receiver(renditions_ready, sender=User)
+def avatar_renditions_ready(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(author=instance))
+    invalidate_response_cache('users', 'recipes')
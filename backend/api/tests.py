@@ -0,0 +1,776 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from base64 import b64encode, urlsafe_b64encode
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from recipes.management.commands.export_recipes import serialize_recipe
+from recipes.management.commands.rank_recipes import (
+    add_scores, decayed_weight
+)
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    PopularityWatermark,
+    Recipe,
+    RecipeImportProgress,
+    RecipeIngredient,
+    RecipePopularity,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Subscription,
+    Tag,
+    User,
+)
+from .fields import StreamingBase64ImageField
+from .serializers import (
+    RecipeSafeSerializer, RecipeSerializer, SubscriptionSerializer
+)
+from .versions import get_version, response_cache_version_key
+
+RECIPES_URL = '/api/recipes/'
+SHOPPING_CART_URL = '/api/recipes/{id}/shopping_cart/'
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+TAGS_URL = '/api/tags/'
+OTHER_HOST = 'other.example'
+DOWNLOAD_SHOPPING_CART_URL = '/api/recipes/download_shopping_cart/'
+PAGE_SIZES = (6, 50, 200)
+RECIPES_COUNT = max(PAGE_SIZES)
+# Количество, страница, авторы, два справочника и четыре запроса
+# values() для рецептов, которых нет в кэше представлений.
+RECIPE_LIST_QUERIES = 9
+PNG_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+# Без изменений ярлыков и продуктов в их таблицы ничего не пишется,
+# а поисковый документ не пересобирается: остаются чтение связей,
+# сохранение рецепта и чтение ответа. Смена ярлыка добавляет удаление,
+# вставку и два сдвига счётчиков, пропущенные поля не читаются вовсе.
+UNCHANGED_PATCH_QUERIES = 16
+UNCHANGED_PUT_QUERIES = 16
+TAG_CHANGE_QUERIES = 19
+OMITTED_FIELDS_QUERIES = 14
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def create_recipes(author, tags, ingredients, count):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'Рецепт {index}',
+            text='Описание',
+            cooking_time=index % 60 + 1,
+            image=f'recipes/{index}.png',
+        )
+        for index in range(count)
+    )
+    if recipes[0].pk is None:
+        recipes = list(Recipe.objects.filter(author=author).order_by('id'))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in tags
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return recipes
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class RecipeListQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='password',
+            first_name='Читатель',
+            last_name='Рецептов',
+        )
+        tags = [
+            Tag.objects.create(name=f'Ярлык {index}', slug=f'tag-{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        create_recipes(cls.user, tags, ingredients, RECIPES_COUNT)
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_list_query_count_does_not_depend_on_page_size(self):
+        for page_size in PAGE_SIZES:
+            with self.subTest(page_size=page_size):
+                clear_caches()
+                with self.assertNumQueries(RECIPE_LIST_QUERIES):
+                    response = self.client.get(
+                        RECIPES_URL, {'limit': page_size}
+                    )
+                self.assertEqual(len(response.data['results']), page_size)
+
+
+class DownloadShoppingCartTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='password',
+            first_name='Покупатель',
+            last_name='Продуктов',
+        )
+        tag = Tag.objects.create(name='Обед', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='Молоко', measurement_unit='мл'
+        )
+        cls.recipe, = create_recipes(cls.user, [tag], [ingredient], 1)
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.user)
+        self.client.post(SHOPPING_CART_URL.format(id=self.recipe.id))
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_pdf_falls_back_to_txt_without_font(self):
+        response = self.client.get(
+            DOWNLOAD_SHOPPING_CART_URL, {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.txt', response['Content-Disposition'])
+        self.assertIn(
+            'Молоко', b''.join(response.streaming_content).decode()
+        )
+
+    def test_pdf_embeds_font_subset(self):
+        if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+            self.skipTest('Нет шрифта для PDF.')
+        response = self.client.get(
+            DOWNLOAD_SHOPPING_CART_URL, {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(
+            len(b''.join(response.streaming_content)),
+            os.path.getsize(settings.SHOPPING_LIST_PDF_FONT) // 4,
+        )
+
+    def test_json_accept_gets_txt_by_default(self):
+        response = self.client.get(
+            DOWNLOAD_SHOPPING_CART_URL, HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.txt', response['Content-Disposition'])
+
+    def test_format_takes_precedence_over_accept(self):
+        response = self.client.get(
+            DOWNLOAD_SHOPPING_CART_URL,
+            {'format': 'csv'},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.csv', response['Content-Disposition'])
+
+    def test_errors_are_rendered_as_json(self):
+        self.client.delete(SHOPPING_CART_URL.format(id=self.recipe.id))
+        for client_user, status in ((self.user, 404), (None, 401)):
+            self.client.force_authenticate(client_user)
+            for params in ({}, {'format': 'pdf'}):
+                with self.subTest(status=status, params=params):
+                    response = self.client.get(
+                        DOWNLOAD_SHOPPING_CART_URL, params
+                    )
+                    self.assertEqual(response.status_code, status)
+                    self.assertEqual(
+                        response['Content-Type'], 'application/json'
+                    )
+                    self.assertIn('detail' if status == 401 else 'User',
+                                  response.json())
+
+
+class CountersTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='Автор',
+            last_name='Рецептов',
+        )
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.user)
+
+    def test_delete_recipe_created_outside_api_keeps_counters_at_zero(self):
+        recipe, = create_recipes(self.user, [self.tag], [self.ingredient], 1)
+        response = self.client.delete(f'{RECIPES_URL}{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.tag.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.tag.recipes_count, 0)
+        self.assertEqual(self.user.recipes_count, 0)
+
+    def test_save_inserts_row_deleted_after_loading(self):
+        tag = Tag.objects.get(pk=self.tag.pk)
+        Tag.objects.filter(pk=tag.pk).delete()
+        tag.name = 'Поздний ужин'
+        tag.save()
+        self.assertEqual(Tag.objects.get(pk=tag.pk).name, 'Поздний ужин')
+
+
+def to_json(data):
+    return json.loads(json.dumps(data))
+
+
+class RowsParityTest(APITestCase):
+    # Списки собираются из values() мимо сериализаторов DRF, поэтому
+    # вывод сверяется с сериализаторами, которые он заменяет.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                username=username,
+                email=f'{username}@example.com',
+                password='password',
+                first_name='Имя',
+                last_name='Фамилия',
+                avatar=avatar,
+            )
+            for username, avatar in (
+                ('author', 'users/author.png'), ('reader', None)
+            )
+        )
+        tags = [
+            Tag.objects.create(name=f'Ярлык {index}', slug=f'tag-{index}')
+            for index in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(3)
+        ]
+        cls.recipes = create_recipes(cls.author, tags, ingredients, 4)
+        FavoriteRecipe.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_recipe_rows_match_serializer(self):
+        for user in (AnonymousUser(), self.reader):
+            with self.subTest(user=user):
+                request = APIRequestFactory().get(RECIPES_URL)
+                request.user = user
+                context = {'request': request}
+                recipes = Recipe.objects.with_related(user).prefetch_related(
+                    'tags', 'recipes_ingredients__ingredient'
+                ).order_by('id')
+                self.assertEqual(
+                    to_json(RecipeSerializer(
+                        recipes, many=True, context=context
+                    ).data),
+                    to_json(RecipeSafeSerializer(
+                        recipes, many=True, context=context
+                    ).data),
+                )
+
+    def test_subscription_rows_match_serializer(self):
+        self.client.force_authenticate(self.reader)
+        request = APIRequestFactory().get(SUBSCRIPTIONS_URL)
+        request.user = self.reader
+        for recipes_limit in (None, 2):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL,
+                    {} if recipes_limit is None
+                    else {'recipes_limit': recipes_limit},
+                )
+                self.assertEqual(
+                    to_json(response.data['results']),
+                    to_json(SubscriptionSerializer(
+                        User.objects.filter(
+                            id=self.author.id
+                        ).with_is_subscribed(self.reader).with_recipes(
+                            recipes_limit
+                        ),
+                        many=True,
+                        context={'request': request},
+                    ).data),
+                )
+
+    def test_invalid_recipes_limit_is_rejected(self):
+        self.client.force_authenticate(self.reader)
+        for recipes_limit in ('-1', 'abc'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL, {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class RecipeUpdateQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='editor',
+            email='editor@example.com',
+            password='password',
+            first_name='Редактор',
+            last_name='Рецептов',
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Ярлык {index}', slug=f'tag-{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        cls.recipe, = create_recipes(cls.user, cls.tags[:2], ingredients, 1)
+
+    def setUp(self):
+        clear_caches()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.client.force_authenticate(self.user)
+        self.url = f'{RECIPES_URL}{self.recipe.id}/'
+        self.data = {
+            'tags': [tag.id for tag in self.tags[:2]],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount
+                in self.recipe.recipes_ingredients.values_list(
+                    'ingredient_id', 'amount'
+                )
+            ],
+            'name': self.recipe.name,
+            'text': self.recipe.text,
+            'cooking_time': self.recipe.cooking_time,
+        }
+
+    def assertUpdateQueries(self, method, data, queries):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            with self.assertNumQueries(queries):
+                response = getattr(self.client, method)(
+                    self.url, data, format='json'
+                )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_unchanged_patch(self):
+        self.assertUpdateQueries('patch', self.data, UNCHANGED_PATCH_QUERIES)
+
+    def test_unchanged_put(self):
+        self.assertUpdateQueries(
+            'put', {**self.data, 'image': PNG_IMAGE}, UNCHANGED_PUT_QUERIES
+        )
+
+    def test_partial_tag_change(self):
+        tags = [self.tags[0].id, self.tags[2].id]
+        response = self.assertUpdateQueries(
+            'patch', {'tags': tags}, TAG_CHANGE_QUERIES
+        )
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']], tags
+        )
+
+    def test_omitted_fields_are_kept(self):
+        self.assertUpdateQueries(
+            'patch', {'cooking_time': 42}, OMITTED_FIELDS_QUERIES
+        )
+        self.assertEqual(self.recipe.tags.count(), 2)
+        self.assertEqual(self.recipe.recipes_ingredients.count(), 5)
+
+
+class ShoppingCartTotalsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook',
+            email='cook@example.com',
+            password='password',
+            first_name='Повар',
+            last_name='Рецептов',
+        )
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.recipes = create_recipes(cls.user, [tag], [cls.ingredient], 2)
+
+    def get_totals(self):
+        return list(ShoppingCartIngredient.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_totals_follow_carts_changed_outside_api(self):
+        for recipe in self.recipes:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.assertEqual(self.get_totals(), [(self.ingredient.id, 20)])
+        self.recipes[0].delete()
+        self.assertEqual(self.get_totals(), [(self.ingredient.id, 10)])
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get_totals(), [])
+
+
+@override_settings(
+    RESPONSE_CACHE_TIMEOUT=60, ALLOWED_HOSTS=['testserver', OTHER_HOST]
+)
+class AnonymousResponseCacheTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='chef',
+            email='chef@example.com',
+            password='password',
+            first_name='Шеф',
+            last_name='Повар',
+        )
+        tag = Tag.objects.create(name='Суп', slug='soup')
+        ingredient = Ingredient.objects.create(
+            name='Вода', measurement_unit='мл'
+        )
+        create_recipes(author, [tag], [ingredient], 1)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_miss_hit_and_invalidation(self):
+        self.assertEqual(self.client.get(TAGS_URL)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(TAGS_URL)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Каша', slug='porridge')
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_hosts_do_not_share_responses(self):
+        self.client.get(RECIPES_URL)
+        response = self.client.get(RECIPES_URL, HTTP_HOST=OTHER_HOST)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn(
+            f'http://{OTHER_HOST}/media/',
+            response.json()['results'][0]['image'],
+        )
+
+    def test_versions_survive_clearing_default_cache(self):
+        key = response_cache_version_key('recipes')
+        version = get_version(key)
+        caches['default'].clear()
+        self.assertEqual(get_version(key), version)
+
+
+def png_chunk(chunk_type, data):
+    return (
+        struct.pack('>I', len(data)) + chunk_type + data
+        + struct.pack('>I', zlib.crc32(chunk_type + data))
+    )
+
+
+def png_header(width, height):
+    # Заголовок PNG с заявленными размерами, сами пиксели не нужны.
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(
+        b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    ) + png_chunk(b'IDAT', b'')
+
+
+class StreamingBase64ImageFieldTest(APITestCase):
+
+    def test_huge_dimensions_are_rejected(self):
+        field = StreamingBase64ImageField()
+        for width, height in ((20000, 20000), (10000, 10000), (20000, 1)):
+            with self.subTest(width=width, height=height):
+                with self.assertRaises(ValidationError) as context:
+                    field.to_internal_value(
+                        'data:image/png;base64,'
+                        + b64encode(png_header(width, height)).decode()
+                    )
+                self.assertEqual(
+                    context.exception.detail[0].code, 'image_dimensions'
+                )
+
+
+class RankRecipesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'fan{index}',
+                email=f'fan{index}@example.com',
+                password='password',
+                first_name='Поклонник',
+                last_name='Рецептов',
+            )
+            for index in range(3)
+        ]
+        cls.recipe, = create_recipes(cls.users[0], [], [], 1)
+
+    def rank(self, *args):
+        call_command('rank_recipes', *args, stdout=StringIO())
+        return RecipePopularity.objects.filter(
+            recipe=self.recipe
+        ).values_list('score', flat=True).first()
+
+    def expected_score(self):
+        score = None
+        for model, weight in ((FavoriteRecipe, 1.0), (ShoppingCart, 0.5)):
+            for created_at in model.objects.filter(
+                recipe=self.recipe
+            ).values_list('created_at', flat=True):
+                score = add_scores(score, decayed_weight(weight, created_at))
+        return score
+
+    def test_repeated_runs_do_not_count_events_twice(self):
+        FavoriteRecipe.objects.create(user=self.users[0], recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.users[0], recipe=self.recipe)
+        self.assertAlmostEqual(self.rank(), self.expected_score())
+        self.assertAlmostEqual(self.rank(), self.expected_score())
+
+    def test_late_committed_event_within_overlap_is_counted(self):
+        FavoriteRecipe.objects.create(
+            id=100, user=self.users[0], recipe=self.recipe
+        )
+        self.rank()
+        watermark = PopularityWatermark.objects.get(
+            source=FavoriteRecipe._meta.label_lower
+        )
+        # Транзакция началась раньше и получила меньший id и время.
+        FavoriteRecipe.objects.create(
+            id=50,
+            user=self.users[1],
+            recipe=self.recipe,
+            created_at=watermark.last_created_at - timedelta(seconds=1),
+        )
+        self.assertAlmostEqual(self.rank(), self.expected_score())
+
+    def test_full_run_accounts_for_removed_events(self):
+        for user in self.users[:2]:
+            FavoriteRecipe.objects.create(user=user, recipe=self.recipe)
+        self.rank()
+        FavoriteRecipe.objects.filter(user=self.users[0]).delete()
+        self.assertAlmostEqual(self.rank('--full'), self.expected_score())
+        FavoriteRecipe.objects.all().delete()
+        self.assertIsNone(self.rank('--full'))
+
+
+class ExportImportRecipesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            User.objects.create_user(
+                username=f'exporter{index}',
+                email=f'exporter{index}@example.com',
+                password='password',
+                first_name='Автор',
+                last_name='Выгрузки',
+            )
+            for index in range(2)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Выгрузка {index}', slug=f'export-{index}'
+            )
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Выгрузка {index}', measurement_unit='г'
+            )
+            for index in range(3)
+        ]
+        create_recipes(authors[0], tags[:2], ingredients[:2], 3)
+        create_recipes(authors[1], tags[1:], ingredients[1:], 2)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.filename = os.path.join(directory, 'recipes.ndjson.gz')
+
+    @staticmethod
+    def exported_recipes():
+        return sorted(
+            (
+                {**recipe, 'id': None}
+                for recipe in map(serialize_recipe, Recipe.objects.all())
+            ),
+            key=lambda recipe: (recipe['author']['email'], recipe['name']),
+        )
+
+    def test_round_trip_restores_recipes_and_counters(self):
+        expected = self.exported_recipes()
+        self.assertEqual(len(expected), 5)
+        call_command('export_recipes', self.filename, stdout=StringIO())
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+        call_command(
+            'import_recipes', self.filename, batch_size=2, stdout=StringIO()
+        )
+        self.assertEqual(self.exported_recipes(), expected)
+        self.assertFalse(RecipeImportProgress.objects.exists())
+        for user in User.objects.all():
+            self.assertEqual(user.recipes_count, user.recipes.count())
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.recipes_count, tag.recipes.count())
+        for ingredient in Ingredient.objects.all():
+            self.assertEqual(
+                ingredient.recipes_count,
+                RecipeIngredient.objects.filter(
+                    ingredient=ingredient
+                ).count(),
+            )
+
+
+def encode_cursor(position):
+    return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class KeysetPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='scroller',
+            email='scroller@example.com',
+            password='password',
+            first_name='Читатель',
+            last_name='Ленты',
+        )
+        recipes = create_recipes(cls.user, [], [], 7)
+        # Половина рецептов опубликована одновременно: порядок среди
+        # них задаёт id.
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes[:4]]
+        ).update(pub_date=recipes[0].pub_date)
+        cls.expected_ids = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def test_cursor_round_trip_visits_every_recipe_once(self):
+        ids = []
+        url = RECIPES_URL
+        params = {'pagination': 'cursor', 'limit': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(ids, self.expected_ids)
+
+    def test_invalid_cursor_is_bad_request(self):
+        for cursor in (
+            'не base64',
+            encode_cursor([1]),
+            encode_cursor(['вчера', 1]),
+            encode_cursor(['2024-01-01T00:00:00+00:00', 10 ** 30]),
+            encode_cursor(['2024-01-01T00:00:00+00:00', [1]]),
+            encode_cursor({'pub_date': 1, 'id': 1}),
+            urlsafe_b64encode(b'[1e400, 1]').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(RECIPES_URL, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ConditionalGetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='revisitor',
+            email='revisitor@example.com',
+            password='password',
+            first_name='Читатель',
+            last_name='Повторный',
+        )
+        cls.recipe, = create_recipes(cls.user, [], [], 1)
+        cls.recipe_url = f'{RECIPES_URL}{cls.recipe.id}/'
+
+    def setUp(self):
+        clear_caches()
+
+    def test_if_none_match_returns_not_modified(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.recipe_url)['ETag']
+        response = self.client.get(self.recipe_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_user_flags(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.recipe_url)['ETag']
+        self.client.post(SHOPPING_CART_URL.format(id=self.recipe.id))
+        response = self.client.get(self.recipe_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.data['is_in_shopping_cart'])
+
+    def test_if_modified_since_for_anonymous(self):
+        last_modified = self.client.get(self.recipe_url)['Last-Modified']
+        response = self.client.get(
+            self.recipe_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=self.recipe.updated_at + timedelta(days=1)
+        )
+        response = self.client.get(
+            self.recipe_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_catalog_etag_changes_after_edit(self):
+        etag = self.client.get(TAGS_URL)['ETag']
+        self.assertEqual(
+            self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Новый ярлык', slug='new-tag')
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
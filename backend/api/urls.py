@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from recipes.executor import as_async_view
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 
@@ -30,6 +31,12 @@ router.register(
     basename='recipes'
 )
 
+ASYNC_VIEW_NAMES = ('recipes-list', 'recipes-detail', 'ingredients-list')
+
+for pattern in router.urls:
+    if pattern.name in ASYNC_VIEW_NAMES:
+        pattern.callback = as_async_view(pattern.callback)
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router .urls)),
@@ -1,29 +1,67 @@
+import csv
 from datetime import datetime
-from io import BytesIO
 
+from django.conf import settings
 
-def generate_content(ingredients, recipes):
+from .pdf import generate_pdf
+
+CSV_HEADER = ('№', 'Продукт', 'Количество', 'Единица измерения')
+
+
+def generate_lines(ingredients, recipes):
     current_time = datetime.now()
-    return BytesIO(('\n'.join((
-        f'{current_time.strftime("%d.%m.%Y %X %Z")}',
-        'Список продуктов:',
-        *[
-            '{0}. {1}: {2} ({3})'.format(
-                line,
-                ingredient['name'].capitalize(),
-                ingredient['amount'],
-                ingredient['measurement_unit'],
-            ) for line, ingredient in enumerate(
-                ingredients,
-                start=1,
-            )
-        ],
-        'для приготовления:',
-        *[
-            f'{line}. {recipe["name"]}'
-            for line, recipe in enumerate(
-                recipes,
-                start=1,
-            )
-        ],
-    ))).encode())
+    yield f'{current_time.strftime("%d.%m.%Y %X %Z")}'
+    yield 'Список продуктов:'
+    for line, ingredient in enumerate(ingredients, start=1):
+        yield '{0}. {1}: {2} ({3})'.format(
+            line,
+            ingredient['name'].capitalize(),
+            ingredient['amount'],
+            ingredient['measurement_unit'],
+        )
+    yield 'для приготовления:'
+    for line, recipe in enumerate(recipes, start=1):
+        yield f'{line}. {recipe["name"]}'
+
+
+def generate_txt(ingredients, recipes):
+    lines = generate_lines(ingredients, recipes)
+    yield next(lines).encode()
+    for line in lines:
+        yield f'\n{line}'.encode()
+
+
+class EchoBuffer:
+    def write(self, value):
+        return value
+
+
+def generate_csv(ingredients, recipes):
+    writer = csv.writer(EchoBuffer())
+    yield '\ufeff'.encode()
+    yield writer.writerow(CSV_HEADER).encode()
+    for line, ingredient in enumerate(ingredients, start=1):
+        yield writer.writerow((
+            line,
+            ingredient['name'].capitalize(),
+            ingredient['amount'],
+            ingredient['measurement_unit'],
+        )).encode()
+    yield writer.writerow(()).encode()
+    yield writer.writerow(('№', 'Рецепт')).encode()
+    for line, recipe in enumerate(recipes, start=1):
+        yield writer.writerow((line, recipe['name'])).encode()
+
+
+def generate_shopping_list_pdf(ingredients, recipes):
+    return generate_pdf(
+        generate_lines(ingredients, recipes),
+        settings.SHOPPING_LIST_PDF_FONT,
+    )
+
+
+SHOPPING_LIST_GENERATORS = {
+    'txt': generate_txt,
+    'csv': generate_csv,
+    'pdf': generate_shopping_list_pdf,
+}
@@ -0,0 +1,32 @@
+from time import time_ns
+
+from django.core.cache import caches
+
+VERSIONS_CACHE = 'versions'
+
+
+def shopping_cart_version_key(user_id):
+    return f'shopping_cart_version:{user_id}'
+
+
+def recipe_feed_version_key(user_id):
+    return f'recipe_feed_version:{user_id}'
+
+
+def catalog_version_key(model):
+    return f'catalog_version:{model._meta.label_lower}'
+
+
+def response_cache_version_key(tag):
+    return f'response_cache_version:{tag}'
+
+
+def get_version(key):
+    return caches[VERSIONS_CACHE].get_or_set(key, time_ns, timeout=None)
+
+
+def bump_versions(*keys):
+    version = time_ns()
+    caches[VERSIONS_CACHE].set_many(
+        {key: version for key in keys}, timeout=None
+    )
@@ -1,11 +1,15 @@
+from collections import defaultdict
 from datetime import datetime
 from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import quote_etag
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import viewsets
 from rest_framework.decorators import action
@@ -14,22 +18,48 @@ from rest_framework.permissions import (
 )
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.validators import ValidationError
 
+from .catalog import CatalogViewSetMixin, ingredient_catalog, tag_catalog
+from .conditional import CatalogConditionalGetMixin, ConditionalGetMixin
 from .filters import IngredientFilter, RecipeFilter
+from .negotiation import ShoppingListContentNegotiation
+from .pagination import KeysetPagination
+from .pdf import font_available
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    CsvShoppingListRenderer,
+    PdfShoppingListRenderer,
+    ShoppingListRenderer,
+    TxtShoppingListRenderer,
+)
+from .response_cache import AnonymousResponseCacheMixin
 from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
     RecipeShortSafeSerializer,
+    ShoppingCartIngredientSerializer,
     SubscriptionSerializer,
     TagSerializer,
     UserAvatarSerializer,
+    short_recipe_row,
+    subscription_row,
+)
+from .utils import SHOPPING_LIST_GENERATORS
+from .versions import (
+    get_version, recipe_feed_version_key, shopping_cart_version_key
 )
-from .utils import generate_content
 
+from recipes.counters import shift_counter
 from recipes.models import (
-    FavoriteRecipe, Ingredient, Recipe, ShoppingCart, Subscription, Tag
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    Subscription,
+    Tag,
 )
 
 
@@ -39,13 +69,67 @@ ERROR_NO_SELF_SUBSCRIPTION = 'Самоподписка не поддержива
 ERROR_ALREADY_SUBSCRIPTED = 'Подписка уже существует'
 ERROR_RECIPE_ALREADY_ADDED = 'Рецепт уже добавлен'
 ERROR_EMPTY_CART = 'Корзина пуста'
+ERROR_RECIPE_LIMIT_NOT_INT = (
+    'recipe_limit должно быть неотрицательным целым числом'
+)
 
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(AnonymousResponseCacheMixin, DjoserUserViewSet):
 
     queryset = User.objects.all()
+    response_cache_tags = ('users',)
+
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError({'detail': ERROR_RECIPE_LIMIT_NOT_INT})
+        if recipes_limit < 0:
+            raise ValidationError({'detail': ERROR_RECIPE_LIMIT_NOT_INT})
+        return recipes_limit
+
+    def get_authors(self, authors):
+        return authors.with_is_subscribed(
+            self.request.user
+        ).with_recipes(self.get_recipes_limit()).order_by(
+            *User._meta.ordering
+        )
+
+    def get_subscription_rows(self, authors):
+        # Список подписок собирается из values() без сериализаторов DRF,
+        # вывод совпадает с SubscriptionSerializer.
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.previews(
+            self.get_recipes_limit()
+        ).filter(
+            author__in=[author['id'] for author in authors]
+        ).values('author', *short_recipe_row.columns):
+            recipes[recipe['author']].append(
+                short_recipe_row(recipe, self.request)
+            )
+        return [
+            subscription_row(
+                {**author, 'recipes': recipes[author['id']]}, self.request
+            )
+            for author in authors
+        ]
+
+    @staticmethod
+    def shift_subscription_counters(user, author, delta):
+        shift_counter(
+            User.objects.filter(id=user.id), 'subscriptions_count', delta
+        )
+        shift_counter(
+            User.objects.filter(id=author.id), 'subscribers_count', delta
+        )
 
     def get_permissions(self):
         if self.action == 'me':
@@ -76,6 +160,7 @@ class UserViewSet(DjoserUserViewSet):
             methods=('post', 'delete'),
             permission_classes=(IsAuthenticated,),
             )
+    @transaction.atomic
     def subscribe(self, request, id):
         user = request.user
         author = get_object_or_404(User, id=id)
@@ -87,15 +172,17 @@ class UserViewSet(DjoserUserViewSet):
                 author=author,
             ).delete()[0] == 0:
                 raise ValidationError({'detail': ERROR_NO_SUBSCRIPRION})
+            self.shift_subscription_counters(user, author, -1)
             return Response(status=HTTPStatus.NO_CONTENT)
         if not Subscription.objects.get_or_create(
             user=user,
             author=author
         )[1]:
             raise ValidationError({'detail': ERROR_ALREADY_SUBSCRIPTED})
+        self.shift_subscription_counters(user, author, 1)
         return Response(
             SubscriptionSerializer(
-                author,
+                self.get_authors(User.objects.filter(id=author.id)).get(),
                 context={'request': request},
             ).data,
             status=HTTPStatus.CREATED
@@ -107,18 +194,24 @@ class UserViewSet(DjoserUserViewSet):
             permission_classes=(IsAuthenticated,),
             )
     def subscriptions(self, request):
+        authors = self.paginate_queryset(
+            User.objects.filter(
+                authors__user=request.user
+            ).with_is_subscribed(request.user).order_by(
+                *User._meta.ordering
+            ).values(*subscription_row.columns, 'is_subscribed')
+        )
         return self.get_paginated_response(
-            SubscriptionSerializer(
-                self.paginate_queryset(
-                    User.objects.filter(authors__user=self.request.user)
-                ),
-                many=True,
-                context={'request': request},
-            ).data
+            self.get_subscription_rows(authors)
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    AnonymousResponseCacheMixin,
+    CatalogViewSetMixin,
+    CatalogConditionalGetMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -126,9 +219,16 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ('name', 'slug',)
     permission_classes = (AllowAny,)
     pagination_class = None
+    response_cache_tags = ('tags',)
+    catalog = tag_catalog
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    AnonymousResponseCacheMixin,
+    CatalogViewSetMixin,
+    CatalogConditionalGetMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -136,17 +236,120 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     permission_classes = (AllowAny,)
     pagination_class = None
+    response_cache_tags = ('ingredients',)
+    catalog = ingredient_catalog
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None or not settings.INGREDIENT_AUTOCOMPLETE_IN_MEMORY:
+            return super().list(request, *args, **kwargs)
+        return (
+            self.get_not_modified_response(request)
+            or Response(ingredient_catalog.search(name))
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
 
-    queryset = Recipe.objects.all().prefetch_related()
+class RecipeViewSet(
+    AnonymousResponseCacheMixin,
+    ConditionalGetMixin,
+    viewsets.ModelViewSet,
+):
+
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly,)
     filterset_class = RecipeFilter
+    vary_headers = ('Authorization',)
+    response_cache_tags = ('recipes',)
+
+    @property
+    def keyset_ordering(self):
+        if self.action != 'popular':
+            return ('-pub_date', '-id')
+        return None
+
+    def get_feed_first_page(self, recipes, page_size):
+        key = 'recipe_feed:{user_id}:{version}:{page_size}'.format(
+            user_id=self.request.user.id,
+            version=get_version(
+                recipe_feed_version_key(self.request.user.id)
+            ),
+            page_size=page_size,
+        )
+        recipe_ids = cache.get(key)
+        if recipe_ids is None:
+            recipe_ids = list(recipes.order_by(
+                *self.keyset_ordering
+            ).values_list('id', flat=True)[:page_size + 1])
+            cache.set(key, recipe_ids, settings.RECIPE_FEED_CACHE_TIMEOUT)
+        return self.get_queryset().filter(id__in=recipe_ids)
+
+    def get_queryset(self):
+        return super().get_queryset().with_related(self.request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(response, 'exception', False) and isinstance(
+            response.accepted_renderer, ShoppingListRenderer
+        ):
+            # Ошибки при выгрузке списка покупок отдаются в JSON, как
+            # и в остальном API, а не под видом файла.
+            renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            response.accepted_renderer = renderer
+            response.accepted_media_type = renderer.media_type
+        return response
+
+    def get_validators(self):
+        user = self.request.user
+        recipes = Recipe.objects.with_user_flags(user)
+        flags = ['is_favorited', 'is_in_shopping_cart']
+        if user.is_authenticated:
+            recipes = recipes.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user, author=OuterRef('author')
+                )
+            ))
+            flags.append('is_subscribed')
+        try:
+            recipe = recipes.values('updated_at', *flags).get(
+                pk=self.kwargs['pk']
+            )
+        except (Recipe.DoesNotExist, TypeError, ValueError):
+            return None
+        updated_at = recipe['updated_at'].timestamp()
+        etag = quote_etag('recipe-{pk}-{updated_at}-{flags}'.format(
+            pk=self.kwargs['pk'],
+            updated_at=updated_at,
+            flags=''.join(str(int(recipe[flag])) for flag in flags),
+        ))
+        # Флаги пользователя не отражаются в дате изменения, поэтому
+        # Last-Modified отдаётся только анонимным пользователям.
+        if user.is_authenticated:
+            return etag, None
+        return etag, int(updated_at)
+
+    def retrieve(self, request, *args, **kwargs):
+        return (
+            self.get_not_modified_response(request)
+            or super().retrieve(request, *args, **kwargs)
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, recipe):
+        shift_counter(
+            User.objects.filter(id=recipe.author_id), 'recipes_count', -1
+        )
+        shift_counter(Tag.objects.filter(recipes=recipe), 'recipes_count', -1)
+        shift_counter(
+            Ingredient.objects.filter(recipes=recipe), 'recipes_count', -1
+        )
+        super().perform_destroy(recipe)
 
     @staticmethod
-    def modify_recipe_connection(request, pk, model):
+    @transaction.atomic
+    def modify_recipe_connection(request, pk, model, counter):
         recipe = get_object_or_404(Recipe, id=pk)
         if request.method == 'DELETE':
             if model.objects.filter(
@@ -154,12 +357,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 recipe=recipe,
             ).delete()[0] == 0:
                 raise ValidationError({'detail': ERROR_NO_RECIPE})
+            shift_counter(Recipe.objects.filter(id=recipe.id), counter, -1)
             return Response(status=HTTPStatus.NO_CONTENT)
         if not model.objects.get_or_create(
             user=request.user,
             recipe=recipe,
         )[1]:
             raise ValidationError({'detail': ERROR_RECIPE_ALREADY_ADDED})
+        shift_counter(Recipe.objects.filter(id=recipe.id), counter, 1)
         return Response(
             RecipeShortSafeSerializer(
                 recipe,
@@ -177,6 +382,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=pk,
             request=request,
             model=FavoriteRecipe,
+            counter='favorites_count',
         )
 
     @action(detail=True,
@@ -188,32 +394,124 @@ class RecipeViewSet(viewsets.ModelViewSet):
             pk=pk,
             request=request,
             model=ShoppingCart,
+            counter='shopping_carts_count',
+        )
+
+    @staticmethod
+    def get_shopping_list(user):
+        key = 'shopping_cart:{user_id}:{version}'.format(
+            user_id=user.id,
+            version=get_version(shopping_cart_version_key(user.id)),
         )
+        shopping_list = cache.get(key)
+        if shopping_list is None:
+            shopping_list = {
+                'ingredients': list(
+                    ShoppingCartIngredient.objects.filter(
+                        user=user
+                    ).order_by('ingredient__name').values(
+                        'amount',
+                        name=F('ingredient__name'),
+                        measurement_unit=F('ingredient__measurement_unit'),
+                    )
+                ),
+                'recipes': list(Recipe.objects.filter(
+                    shoppingcarts__user=user
+                ).order_by('name').values('name')),
+            }
+            cache.set(
+                key, shopping_list, settings.SHOPPING_CART_CACHE_TIMEOUT
+            )
+        return shopping_list
+
+    @action(detail=False,
+            methods=('get',),
+            permission_classes=(IsAuthenticated,),
+            url_path='shopping_cart/summary',
+            )
+    def shopping_cart_summary(self, request):
+        return Response(ShoppingCartIngredientSerializer(
+            ShoppingCartIngredient.objects.filter(
+                user=request.user
+            ).order_by('ingredient__name'),
+            many=True,
+        ).data)
 
     @action(detail=False,
             methods=('get',),
             permission_classes=(IsAuthenticated,),
+            renderer_classes=(
+                TxtShoppingListRenderer,
+                CsvShoppingListRenderer,
+                PdfShoppingListRenderer,
+            ),
+            content_negotiation_class=ShoppingListContentNegotiation,
             )
     def download_shopping_cart(self, request):
-        user = request.user
-        if not user.shoppingcarts.exists():
+        shopping_list = self.get_shopping_list(request.user)
+        if not shopping_list['recipes']:
             raise NotFound(
                 {'User': ERROR_EMPTY_CART}
             )
         current_time = datetime.now()
-        return FileResponse(
-            generate_content(
-                ingredients=Ingredient.objects.filter(
-                    recipes_ingredients__recipe__shoppingcarts__user=user
-                ).annotate(
-                    amount=Sum("recipes_ingredients__amount")
-                ).order_by('name').values(),
-                recipes=Recipe.objects.filter(
-                    shoppingcarts__user=user
-                ).order_by('name').values(),
+        renderer = request.accepted_renderer
+        if (
+            renderer.format == PdfShoppingListRenderer.format
+            and not font_available(settings.SHOPPING_LIST_PDF_FONT)
+        ):
+            renderer = TxtShoppingListRenderer()
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_GENERATORS[renderer.format](**shopping_list),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
             ),
-            as_attachment=True,
-            filename=f'to_buy_{current_time.strftime("%Y%m%d")}.txt'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="to_buy_{date}.{format}"'.format(
+                date=current_time.strftime("%Y%m%d"),
+                format=renderer.format,
+            )
+        )
+        return response
+
+    @action(detail=False,
+            methods=('get',),
+            permission_classes=(IsAuthenticated,),
+            )
+    def feed(self, request):
+        paginator = KeysetPagination(self.keyset_ordering)
+        recipes = self.get_queryset().filter(
+            author__in=Subscription.objects.filter(
+                user=request.user
+            ).values('author')
+        )
+        if not (
+            {paginator.cursor_query_param, paginator.count_query_param}
+            & request.query_params.keys()
+        ):
+            recipes = self.get_feed_first_page(
+                recipes, paginator.get_page_size(request)
+            )
+        return paginator.get_paginated_response(
+            self.get_serializer(
+                paginator.paginate_queryset(recipes, request, self),
+                many=True,
+            ).data
+        )
+
+    @action(detail=False,
+            methods=('get',),
+            permission_classes=(AllowAny,),
+            )
+    def popular(self, request):
+        recipes = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).filter(
+                popularity__isnull=False
+            ).order_by('-popularity__score')
+        )
+        return self.get_paginated_response(
+            self.get_serializer(recipes, many=True).data
         )
 
     @action(detail=True,
@@ -2,4 +2,9 @@
 
 python manage.py migrate
 python manage.py collectstatic --no-input
-exec gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
\ No newline at end of file
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-1}" \
+        --worker-class uvicorn.workers.UvicornWorker foodgram_backend.asgi
+fi
+exec gunicorn --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-1}" \
+    foodgram_backend.wsgi
\ No newline at end of file
@@ -1,4 +1,6 @@
 import os
+import tempfile
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,6 +26,43 @@ SUBSCRIPTIONS_ENDPOINT = 'subscriptions'
 
 SHORT_RECIPE_ENDPOINT = 's'
 
+INGREDIENT_AUTOCOMPLETE_IN_MEMORY = (
+    os.getenv('INGREDIENT_AUTOCOMPLETE_IN_MEMORY', 'True') == 'True'
+)
+
+POPULARITY_HALF_LIFE = timedelta(
+    days=int(os.getenv('POPULARITY_HALF_LIFE_DAYS', 7))
+)
+
+POPULARITY_OVERLAP = timedelta(
+    minutes=int(os.getenv('POPULARITY_OVERLAP_MINUTES', 10))
+)
+
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_FEED_CACHE_TIMEOUT = 60 * 10
+
+RECIPE_REPRESENTATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+
+ASYNC_VIEWS = os.getenv('SERVER_MODE', 'wsgi') == 'asgi'
+
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 8))
+
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+IMAGE_UPLOAD_MAX_DIMENSION = int(os.getenv('IMAGE_UPLOAD_MAX_DIMENSION', 6000))
+
 
 # Application definition
 
@@ -94,6 +133,67 @@ DATABASES = {
     }
 }
 
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+VERSIONS_CACHE_MAX_ENTRIES = int(
+    os.getenv('VERSIONS_CACHE_MAX_ENTRIES', 1000000)
+)
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache'),
+        ),
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+# Версии кэшей лежат отдельно: при вытеснении вместе с ответами
+# и представлениями рецептов пропали бы все зависящие от них записи.
+# Локальный и файловый кэши не общие для серверов, поэтому
+# в production нужен Redis.
+VERSIONS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+        'OPTIONS': {'MAX_ENTRIES': VERSIONS_CACHE_MAX_ENTRIES},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'VERSIONS_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram_cache_versions'),
+        ),
+        'OPTIONS': {'MAX_ENTRIES': VERSIONS_CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv(
+            'VERSIONS_CACHE_LOCATION', 'redis://127.0.0.1:6379/2'
+        ),
+    },
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+    'versions': VERSIONS_CACHE_BACKENDS[CACHE_BACKEND],
+}
+
 # Custom user model
 
 AUTH_USER_MODEL = 'recipes.User'
@@ -117,7 +217,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+FAST_JSON = os.getenv('FAST_JSON', 'True') == 'True'
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer'
+        if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser'
+        if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
@@ -1,9 +1,9 @@
 from sys import maxsize
 
+from django.apps import apps
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
-from django.db.models import Q
 from django.utils.safestring import mark_safe
 
 from .models import (
@@ -13,11 +13,22 @@ from .models import (
     Subscription, Tag,
     User
 )
+from .counters import recount_shopping_carts
+from .images import get_rendition_url
+from .search import search_recipes, update_search_documents
 
 
 THUMBNAIL_WIDTH = 120
 THUMBNAIL_HEIGHTH = 100
 
+
+def thumbnail_tag(file, renditions):
+    return (
+        f'<img src="{get_rendition_url(file, renditions)}"'
+        f' width="{THUMBNAIL_WIDTH}" height="{THUMBNAIL_HEIGHTH}">'
+    )
+
+
 admin.site.unregister(Group)
 
 
@@ -33,11 +44,15 @@ class SubscribtionsRecipesFilter(admin.SimpleListFilter):
             ('recipes', 'С рецептами')
         )
 
+    COUNTERS = {
+        'authors': 'subscribers_count',
+        'subscribers': 'subscriptions_count',
+        'recipes': 'recipes_count',
+    }
+
     def queryset(self, request, users):
-        if self.value():
-            return users.filter(
-                Q(**{f'{self.value()}__isnull': False})
-            ).distinct()
+        if self.value() in self.COUNTERS:
+            return users.filter(**{f'{self.COUNTERS[self.value()]}__gt': 0})
         return users
 
 
@@ -49,9 +64,9 @@ class FoodgramUserAdmin(UserAdmin):
         'last_name',
         'email',
         'avatar_preview',
-        'total_recipes',
-        'total_subscribers',
-        'total_subscriptions',
+        'recipes_count',
+        'subscribers_count',
+        'subscriptions_count',
     )
     UserAdmin.fieldsets += ('Аватар', {'fields': ('avatar',)}),
     search_fields = ('username', 'email')
@@ -63,21 +78,9 @@ class FoodgramUserAdmin(UserAdmin):
     @mark_safe
     def avatar_preview(self, user):
         if user.avatar:
-            return f'<img src="{user.avatar.url}" width="120" height="100">'
+            return thumbnail_tag(user.avatar, user.avatar_renditions)
         return None
 
-    @admin.display(description='Рецепты')
-    def total_recipes(self, recipe):
-        return recipe.recipes.count()
-
-    @admin.display(description='Подписки')
-    def total_subscriptions(self, user):
-        return user.subscribers.count()
-
-    @admin.display(description='Подписчики')
-    def total_subscribers(self, user):
-        return user.authors.count()
-
 
 class CookingTimeFilter(admin.SimpleListFilter):
 
@@ -137,22 +140,35 @@ class RecipeAdmin(admin.ModelAdmin):
         'thumbnail',
         'tags_list',
         'ingredients_list',
-        'favs_count',
+        'favorites_count',
     )
     list_filter = (
         'author__username',
         'tags__name',
         CookingTimeFilter
     )
-    search_fields = ('name', 'tags__name',)
+    search_fields = ('name',)
     inlines = [
         RecipeIngredientInline,
     ]
 
+    def get_search_results(self, request, recipes, search_term):
+        return search_recipes(recipes, search_term), False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_search_documents(Recipe.objects.filter(pk=form.instance.pk))
+        # Продукты в инлайне сохраняются по одному, поэтому суммы в корзинах
+        # пересчитываются целиком у тех, у кого рецепт в корзине.
+        recount_shopping_carts(
+            apps,
+            form.instance.shoppingcarts.values_list('user_id', flat=True),
+        )
+
     @admin.display(description='Миниатюра')
     @mark_safe
     def thumbnail(self, recipe):
-        return f'<img src="{recipe.image.url}" width="120" height="100">'
+        return thumbnail_tag(recipe.image, recipe.image_renditions)
 
     @admin.display(description='Ярлыки')
     @mark_safe
@@ -170,10 +186,6 @@ class RecipeAdmin(admin.ModelAdmin):
             ) for ingredient in recipe.recipes_ingredients.all()
         )
 
-    @admin.display(description='В избранном')
-    def favs_count(self, recipe):
-        return recipe.favoriterecipes.count()
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -181,20 +193,12 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('measurement_unit',)
     search_fields = ('name__istartswith', 'measurement_unit')
 
-    @admin.display(description='В рецептах')
-    def recipes_count(self, ingredient):
-        return ingredient.recipes.count()
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'slug', 'recipes_count')
     search_fields = ('name__istartswith', 'slug')
 
-    @admin.display(description='В рецептах')
-    def recipes_count(self, ingredient):
-        return ingredient.recipes.count()
-
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipe(admin.ModelAdmin):
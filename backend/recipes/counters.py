@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+RECOUNT_BATCH_SIZE = 1000
+COUNTERS = (
+    ('Recipe', 'favorites_count', 'FavoriteRecipe', 'recipe'),
+    ('Recipe', 'shopping_carts_count', 'ShoppingCart', 'recipe'),
+    ('User', 'recipes_count', 'Recipe', 'author'),
+    ('User', 'subscribers_count', 'Subscription', 'author'),
+    ('User', 'subscriptions_count', 'Subscription', 'user'),
+    ('Tag', 'recipes_count', 'Recipe_tags', 'tag'),
+    ('Ingredient', 'recipes_count', 'RecipeIngredient', 'ingredient'),
+)
+
+
+def shift_counter(objects, field, delta):
+    # Строки, созданные в обход API (админка, импорт), не увеличивали
+    # счётчики, поэтому уменьшение не должно уводить их ниже нуля.
+    return objects.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def shift_counters(model, field, deltas):
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        shift_counter(model.objects.filter(id__in=ids), field, delta)
+
+
+def recount_counters(apps):
+    for model_name, field, related_model_name, related_field in COUNTERS:
+        model = apps.get_model('recipes', model_name)
+        related_model = apps.get_model('recipes', related_model_name)
+        model.objects.update(**{field: Coalesce(
+            Subquery(
+                related_model.objects.filter(
+                    **{related_field: OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    count=Count('pk')
+                ).values('count')
+            ),
+            0,
+        )})
+
+
+def recount_shopping_carts(apps, user_ids=None):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    carts = ShoppingCart.objects.all()
+    items = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(**row)
+            for row in carts.filter(
+                recipe__recipes_ingredients__isnull=False
+            ).order_by().values(
+                'user_id',
+                ingredient_id=F('recipe__recipes_ingredients__ingredient'),
+            ).annotate(
+                amount=Sum('recipe__recipes_ingredients__amount')
+            ).iterator()
+        ),
+        batch_size=RECOUNT_BATCH_SIZE,
+    )
+
+
+class CountersModelMixin:
+    # Счётчики меняются только атомарными UPDATE, поэтому полное сохранение
+    # объекта не должно перезаписывать их значениями, прочитанными раньше.
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            counters = {
+                field
+                for model_name, field, *_ in COUNTERS
+                if model_name == type(self).__name__
+            }
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in counters
+                and field.attname not in deferred
+            ]
+            # Если строку удалили после того, как объект был прочитан,
+            # он сохраняется вставкой, как без update_fields.
+            if not type(self)._base_manager.using(
+                kwargs.get('using') or self._state.db
+            ).filter(pk=self.pk).exists():
+                del kwargs['update_fields']
+        return super().save(*args, **kwargs)
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='foodgram-db',
+)
+
+
+def run_in_db_thread(func):
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=db_executor)
+
+
+def as_async_view(view):
+    # Django 3.2 под ASGI выполняет все синхронные представления в одном
+    # общем потоке. Обёртка переносит представление вместе с рендерингом
+    # ответа в ограниченный пул, и запросы одного воркера идут параллельно.
+    if not settings.ASYNC_VIEWS:
+        return view
+
+    @run_in_db_thread
+    def render_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await render_view(request, *args, **kwargs)
+
+    return async_view
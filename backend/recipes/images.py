@@ -0,0 +1,139 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'renditions'
+SOURCE_KEY = 'source'
+THUMB = 'thumb'
+RENDITION_SIZES = {
+    THUMB: (120, 100),
+    'card': (480, 360),
+    'full': (1280, 1280),
+}
+RENDITION_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+RENDITION_QUALITY = 82
+JPEG_BACKGROUND = (255, 255, 255)
+
+renditions_ready = Signal()
+
+image_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='foodgram-images',
+)
+
+
+def get_renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def rendition_name(source, rendition, extension):
+    return '{directory}/{source}/{rendition}.{extension}'.format(
+        directory=RENDITIONS_DIR,
+        source=os.path.splitext(source)[0],
+        rendition=rendition,
+        extension=extension,
+    )
+
+
+def resize(image, rendition, size):
+    if rendition == THUMB:
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, JPEG_BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=RENDITION_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_renditions(file):
+    with file.storage.open(file.name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image = image.convert(
+            'RGBA' if 'A' in image.getbands() or 'transparency' in image.info
+            else 'RGB'
+        )
+    renditions = {SOURCE_KEY: file.name}
+    for rendition, size in RENDITION_SIZES.items():
+        resized = resize(image, rendition, size)
+        renditions[rendition] = {}
+        for extension, image_format in RENDITION_FORMATS.items():
+            name = rendition_name(file.name, rendition, extension)
+            file.storage.delete(name)
+            renditions[rendition][extension] = file.storage.save(
+                name, encode(resized, image_format)
+            )
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for rendition, files in renditions.items():
+        if rendition != SOURCE_KEY:
+            for name in files.values():
+                storage.delete(name)
+
+
+def process_renditions(model, pk, field_name):
+    renditions_field = get_renditions_field(field_name)
+    close_old_connections()
+    try:
+        instance = model.objects.only(
+            field_name, renditions_field
+        ).filter(pk=pk).first()
+        if instance is None:
+            return
+        file = getattr(instance, field_name)
+        renditions = generate_renditions(file) if file else {}
+        if model.objects.filter(
+            pk=pk, **{field_name: file.name}
+        ).update(**{renditions_field: renditions}):
+            delete_renditions(file.storage, {
+                rendition: files
+                for rendition, files
+                in getattr(instance, renditions_field).items()
+                if files != renditions.get(rendition)
+            })
+            renditions_ready.send(sender=model, instance=instance)
+        else:
+            delete_renditions(file.storage, renditions)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить копии изображения %s %s', model, pk
+        )
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(instance, field_name):
+    file = getattr(instance, field_name)
+    renditions = getattr(instance, get_renditions_field(field_name))
+    if (file.name or None) == renditions.get(SOURCE_KEY):
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: image_executor.submit(
+        process_renditions, model, pk, field_name
+    ))
+
+
+def get_rendition_url(file, renditions, rendition=THUMB, extension='jpeg'):
+    name = renditions.get(rendition, {}).get(extension)
+    return file.storage.url(name) if name else file.url
@@ -0,0 +1,35 @@
+import gzip
+import json
+import os
+
+from django.core.management.base import CommandError
+from django.dispatch import Signal
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ERROR_NO_ZSTANDARD = (
+    'Для файлов .zst нужен пакет zstandard: pip install zstandard'
+)
+
+# Отправляется после сохранения каждой пачки рецептов: bulk-операции
+# не вызывают post_save.
+recipes_imported = Signal()
+
+
+def open_archive(filename, mode):
+    extension = os.path.splitext(filename)[1]
+    if extension == '.gz':
+        return gzip.open(filename, f'{mode}t', encoding='utf-8')
+    if extension == '.zst':
+        if zstandard is None:
+            raise CommandError(ERROR_NO_ZSTANDARD)
+        return zstandard.open(filename, f'{mode}t', encoding='utf-8')
+    return open(filename, mode, encoding='utf-8')
+
+
+def write_record(file, record):
+    file.write(json.dumps(record, ensure_ascii=False))
+    file.write('\n')
@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from ...models import Recipe, RecipeIngredient
+from ..archive import open_archive, write_record
+
+COMMAND_HELP = '''export_recipes - выгружает рецепты с продуктами, ярлыками
+                и ссылками на изображения в файл ndjson, по одному
+                рецепту в строке. Файлы .gz и .zst сжимаются.
+                '''
+FILENAME_HELP = 'Файл выгрузки: .ndjson, .ndjson.gz или .ndjson.zst.'
+AFTER_ID_HELP = (
+    'Дописать в файл рецепты с id больше указанного, '
+    'чтобы продолжить прерванную выгрузку.'
+)
+CHUNK_SIZE_HELP = 'Количество рецептов, читаемых из базы за один запрос.'
+PROGRESS = 'Выгружено рецептов: {count}, последний id: {last_id}'
+REPORT = 'Выгружено рецептов: {count}'
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def serialize_recipe(recipe):
+    return {
+        'id': recipe.id,
+        'author': {
+            'email': recipe.author.email,
+            'username': recipe.author.username,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'image_renditions': recipe.image_renditions,
+        'tags': [
+            {'name': tag.name, 'slug': tag.slug} for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipes_ingredients.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', type=str, help=FILENAME_HELP)
+        parser.add_argument(
+            '--after-id', type=int, default=None, help=AFTER_ID_HELP
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=CHUNK_SIZE_HELP,
+        )
+
+    @staticmethod
+    def iterate_recipes(last_id, chunk_size):
+        # iterator() не выполняет prefetch_related, поэтому рецепты читаются
+        # пачками по id: память не растёт, а запросов по три на пачку.
+        recipes = Recipe.objects.order_by('id').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipes_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+        while True:
+            chunk = list(recipes.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1].id
+
+    def handle(self, *args, **kwargs):
+        after_id = kwargs['after_id']
+        count = 0
+        with open_archive(
+            kwargs['filename'], 'w' if after_id is None else 'a'
+        ) as file:
+            for chunk in self.iterate_recipes(
+                after_id or 0, kwargs['chunk_size']
+            ):
+                for recipe in chunk:
+                    write_record(file, serialize_recipe(recipe))
+                count += len(chunk)
+                if kwargs['verbosity'] > 1:
+                    self.stdout.write(PROGRESS.format(
+                        count=count, last_id=chunk[-1].id
+                    ))
+        self.stdout.write(REPORT.format(count=count))
@@ -4,11 +4,12 @@ from ...models import Ingredient
 
 DEFAULT_FILENAME = 'data/ingredients.json'
 COMMAND_HELP = f'''fill_tags - заполняет базу данных продукатами
-                из json-файла указанной в параметрах команды.
+                из файла json, ndjson или csv, указанного в параметрах
+                команды. Уже имеющиеся продукты пропускаются.
                 По умолчанию берётся файл
                 {DEFAULT_FILENAME}
                 '''
-DATA_HELP = 'Файл json для заполнения базы данных ярлыками.'
+DATA_HELP = 'Файл json, ndjson или csv для заполнения базы данных ярлыками.'
 
 
 class Command(AbstractImportJsonCommand):
@@ -16,5 +17,7 @@ class Command(AbstractImportJsonCommand):
 
     class Meta:
         model = Ingredient
+        key_fields = ('name', 'measurement_unit')
+        update_fields = ()
         default_filename = DEFAULT_FILENAME
         data_help = DATA_HELP
@@ -4,11 +4,12 @@ from ..fill_command import AbstractImportJsonCommand
 
 DEFAULT_FILENAME = 'data/tags.json'
 COMMAND_HELP = '''fill_tags - заполняет базу данных ярлыками
-                из json-файла указанной в параметрах команды.
+                из файла json, ndjson или csv, указанного в параметрах
+                команды. Существующие записи обновляются.
                 По умолчанию берётся файл
                 {DEFAULT_FILENAME}
                 '''
-DATA_HELP = 'Файл json для заполнения базы данных ярлыками.'
+DATA_HELP = 'Файл json, ndjson или csv для заполнения базы данных ярлыками.'
 
 
 class Command(AbstractImportJsonCommand):
@@ -16,5 +17,7 @@ class Command(AbstractImportJsonCommand):
 
     class Meta:
         model = Tag
+        key_fields = ('slug',)
+        update_fields = ('name',)
         default_filename = DEFAULT_FILENAME
         data_help = DATA_HELP
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from ...images import process_renditions
+from ...models import Recipe, User
+
+COMMAND_HELP = '''generate_renditions - готовит уменьшенные копии изображений
+                рецептов и аватаров, у которых их ещё нет.
+                '''
+REPORT = '{model}: обработано изображений — {count}'
+IMAGE_FIELDS = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def handle(self, *args, **kwargs):
+        for model, field_name in IMAGE_FIELDS:
+            pks = model.objects.exclude(
+                **{field_name: ''}
+            ).exclude(
+                **{f'{field_name}__isnull': True}
+            ).filter(
+                **{f'{field_name}_renditions': {}}
+            ).values_list('pk', flat=True)
+            count = 0
+            for pk in list(pks):
+                process_renditions(model, pk, field_name)
+                count += 1
+            self.stdout.write(REPORT.format(
+                model=model._meta.verbose_name_plural, count=count
+            ))
@@ -0,0 +1,240 @@
+import os
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from ...counters import shift_counters
+from ...models import (
+    MAX_IMPORT_FILENAME_LENGTH,
+    Ingredient,
+    Recipe,
+    RecipeImportProgress,
+    RecipeIngredient,
+    Tag,
+    User,
+)
+from ...search import build_search_document, sync_search_index
+from ..archive import open_archive, recipes_imported
+from ..fill_command import DEFAULT_BATCH_SIZE, catalog_imported, read_ndjson
+
+COMMAND_HELP = '''import_recipes - загружает рецепты из файла, подготовленного
+                командой export_recipes. Продукты и ярлыки сопоставляются
+                по названию и единице измерения и по идентификатору,
+                авторы — по почте; недостающие создаются. Прерванная
+                загрузка неизменённого файла продолжается с последней
+                сохранённой пачки.
+                Изображения не копируются: файлы должны быть в хранилище.
+                SQLite не возвращает id из bulk_create, поэтому id новых
+                рецептов читаются обратно как последние в таблице. Это
+                верно, пока в базу пишет только загрузка: SQLite держит
+                блокировку записи до конца транзакции с пачкой. Другие
+                базы без возврата id не поддерживаются.
+                '''
+FILENAME_HELP = 'Файл выгрузки: .ndjson, .ndjson.gz или .ndjson.zst.'
+BATCH_SIZE_HELP = 'Количество рецептов, сохраняемых в одной транзакции.'
+RESTART_HELP = 'Загрузить файл с начала, даже если он уже загружался.'
+ERROR_UNRESOLVED = '{model}: не удалось найти или создать {keys}'
+ERROR_NO_RETURNED_IDS = 'База {vendor} не возвращает id из bulk_create'
+RESUME = 'Продолжение загрузки после рецепта с id {last_id}'
+PROGRESS = 'Загружено рецептов: {count}, последний id в файле: {last_id}'
+REPORT = 'Загружено рецептов: {count}'
+TAG_FIELDS = ('name', 'slug')
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', type=str, help=FILENAME_HELP)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=BATCH_SIZE_HELP,
+        )
+        parser.add_argument(
+            '--restart', action='store_true', help=RESTART_HELP
+        )
+
+    @staticmethod
+    def find_ids(model, key_fields, keys):
+        objects = model.objects.filter(**{
+            f'{field}__in': {key[index] for key in keys}
+            for index, field in enumerate(key_fields)
+        }).only('id', *key_fields)
+        return {
+            tuple(getattr(instance, field) for field in key_fields):
+                instance.id
+            for instance in objects
+        }
+
+    def resolve(self, model, key_fields, items, **defaults):
+        items = {
+            tuple(item[field] for field in key_fields): item
+            for item in items
+        }
+        ids = self.find_ids(model, key_fields, items)
+        missing = [item for key, item in items.items() if key not in ids]
+        if not missing:
+            return ids, False
+        model.objects.bulk_create(
+            (model(**item, **defaults) for item in missing),
+            ignore_conflicts=True,
+        )
+        ids = self.find_ids(model, key_fields, items)
+        unresolved = items.keys() - ids.keys()
+        if unresolved:
+            raise CommandError(ERROR_UNRESOLVED.format(
+                model=model._meta.verbose_name_plural, keys=unresolved
+            ))
+        return ids, True
+
+    def resolve_catalog(self, model, key_fields, fields, items):
+        ids, created = self.resolve(model, key_fields, (
+            {field: item[field] for field in fields} for item in items
+        ))
+        if created:
+            catalog_imported.send(sender=model, updated_ids=[])
+        return ids
+
+    @staticmethod
+    def create_recipes(recipes):
+        Recipe.objects.bulk_create(recipes)
+        if not recipes or recipes[0].pk is not None:
+            return
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                ERROR_NO_RETURNED_IDS.format(vendor=connection.vendor)
+            )
+        # SQLite в Django 3.2 не возвращает id из bulk_create. Писать в базу
+        # внутри транзакции может только одно соединение, поэтому только что
+        # вставленные строки — последние по id.
+        ids = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        )[:len(recipes)]
+        for recipe, pk in zip(recipes, reversed(ids)):
+            recipe.pk = pk
+
+    def import_batch(self, records):
+        authors, _ = self.resolve(
+            User,
+            ('email',),
+            (
+                {field: record['author'][field] for field in AUTHOR_FIELDS}
+                for record in records
+            ),
+            password=make_password(None),
+        )
+        tags = self.resolve_catalog(
+            Tag,
+            ('slug',),
+            TAG_FIELDS,
+            (tag for record in records for tag in record['tags']),
+        )
+        ingredients = self.resolve_catalog(
+            Ingredient,
+            INGREDIENT_FIELDS,
+            INGREDIENT_FIELDS,
+            (
+                ingredient
+                for record in records for ingredient in record['ingredients']
+            ),
+        )
+        recipes = [
+            Recipe(
+                author_id=authors[(record['author']['email'],)],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                image_renditions=record['image_renditions'],
+                search_document=build_search_document(
+                    record['name'],
+                    record['text'],
+                    (item['name'] for item in record['ingredients']),
+                ),
+            )
+            for record in records
+        ]
+        self.create_recipes(recipes)
+        # bulk_create проставляет дату публикации через auto_now_add,
+        # поэтому исходная дата записывается отдельным запросом.
+        for recipe, record in zip(recipes, records):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        recipe_tags = [
+            Recipe.tags.through(
+                recipe_id=recipe.id, tag_id=tags[(tag['slug'],)]
+            )
+            for recipe, record in zip(recipes, records)
+            for tag in record['tags']
+        ]
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+        recipe_ingredients = [
+            RecipeIngredient(
+                recipe_id=recipe.id,
+                ingredient_id=ingredients[
+                    tuple(item[field] for field in INGREDIENT_FIELDS)
+                ],
+                amount=item['amount'],
+            )
+            for recipe, record in zip(recipes, records)
+            for item in record['ingredients']
+        ]
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        shift_counters(User, 'recipes_count', Counter(
+            recipe.author_id for recipe in recipes
+        ))
+        shift_counters(Tag, 'recipes_count', Counter(
+            item.tag_id for item in recipe_tags
+        ))
+        shift_counters(Ingredient, 'recipes_count', Counter(
+            item.ingredient_id for item in recipe_ingredients
+        ))
+        sync_search_index(Recipe.objects.db, recipes)
+        recipes_imported.send(
+            sender=Recipe,
+            author_ids={recipe.author_id for recipe in recipes},
+        )
+
+    def handle(self, *args, **kwargs):
+        filename = kwargs['filename']
+        stat = os.stat(filename)
+        progress, _ = RecipeImportProgress.objects.get_or_create(
+            filename=os.path.basename(filename)[:MAX_IMPORT_FILENAME_LENGTH],
+            size=stat.st_size,
+            modified_ns=stat.st_mtime_ns,
+        )
+        if kwargs['restart']:
+            progress.last_id = 0
+        elif progress.last_id:
+            self.stdout.write(RESUME.format(last_id=progress.last_id))
+        count = 0
+        with open_archive(filename, 'r') as file:
+            # Выгрузка упорядочена по id, поэтому отметки последнего
+            # сохранённого рецепта достаточно, чтобы продолжить загрузку.
+            records = (
+                record for record in read_ndjson(file)
+                if record['id'] > progress.last_id
+            )
+            while True:
+                batch = list(islice(records, kwargs['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    self.import_batch(batch)
+                    progress.last_id = batch[-1]['id']
+                    progress.save()
+                count += len(batch)
+                if kwargs['verbosity'] > 1:
+                    self.stdout.write(PROGRESS.format(
+                        count=count, last_id=progress.last_id
+                    ))
+        progress.delete()
+        self.stdout.write(REPORT.format(count=count))
@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+from math import log2
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import (
+    FavoriteRecipe, PopularityWatermark, RecipePopularity, ShoppingCart
+)
+
+COMMAND_HELP = '''rank_recipes - пересчитывает популярность рецептов
+                по добавлениям в избранное и в корзину. Учитываются
+                рецепты с событиями не старше последней отметки минус
+                POPULARITY_OVERLAP: окно перекрытия подбирает записи
+                из транзакций, зафиксированных позже более новых.
+                Очки таких рецептов считаются заново по всем событиям.
+                Удаление из избранного или корзины не оставляет
+                событий, поэтому его учитывает только запуск с ключом
+                --full, который строит таблицу заново; запускайте его
+                периодически.
+                '''
+FULL_HELP = 'Перестроить таблицу популярности с нуля.'
+REPORT = '{source}: событий — {events}, рецептов — {recipes}'
+RECOUNT_REPORT = 'Пересчитана популярность рецептов: {recipes}'
+SOURCES = (
+    (FavoriteRecipe, 1.0),
+    (ShoppingCart, 0.5),
+)
+CHUNK_SIZE = 2000
+POPULARITY_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def decayed_weight(weight, created_at):
+    # Вес события растёт со временем, а не затухает: порядок рецептов
+    # получается тем же, что и при экспоненциальном затухании старых
+    # событий, но накопленные очки не нужно пересчитывать. Сам вес
+    # 2 ** (возраст / период полураспада) через пару тысяч периодов
+    # переполнит float, поэтому очки хранятся как его логарифм.
+    return log2(weight) + (
+        (created_at - POPULARITY_EPOCH).total_seconds()
+        / settings.POPULARITY_HALF_LIFE.total_seconds()
+    )
+
+
+def add_scores(score, other):
+    # log2(2 ** score + 2 ** other) без вычисления самих степеней.
+    if score is None:
+        return other
+    low, high = sorted((score, other))
+    return high + log2(1 + 2 ** (low - high))
+
+
+def recipe_scores(recipe_ids):
+    scores = {}
+    for model, weight in SOURCES:
+        for recipe_id, created_at in model.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'created_at').iterator(
+            chunk_size=CHUNK_SIZE
+        ):
+            scores[recipe_id] = add_scores(
+                scores.get(recipe_id), decayed_weight(weight, created_at)
+            )
+    return scores
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help=FULL_HELP)
+
+    @staticmethod
+    def apply_scores(recipe_ids):
+        recipe_ids = sorted(recipe_ids)
+        for start in range(0, len(recipe_ids), CHUNK_SIZE):
+            scores = recipe_scores(recipe_ids[start:start + CHUNK_SIZE])
+            existing = RecipePopularity.objects.in_bulk(list(scores))
+            for recipe_id, popularity in existing.items():
+                popularity.score = scores[recipe_id]
+            RecipePopularity.objects.bulk_update(
+                existing.values(), ('score',)
+            )
+            RecipePopularity.objects.bulk_create(
+                RecipePopularity(recipe_id=recipe_id, score=score)
+                for recipe_id, score in scores.items()
+                if recipe_id not in existing
+            )
+
+    def touched_recipes(self, model, full):
+        watermark, _ = PopularityWatermark.objects.select_for_update(
+        ).get_or_create(source=model._meta.label_lower)
+        events = model.objects.all()
+        if full:
+            watermark.last_created_at = None
+        elif watermark.last_created_at is not None:
+            events = events.filter(
+                created_at__gt=(
+                    watermark.last_created_at - settings.POPULARITY_OVERLAP
+                )
+            )
+        recipe_ids = set()
+        count = 0
+        for recipe_id, created_at in events.values_list(
+            'recipe_id', 'created_at'
+        ).iterator(chunk_size=CHUNK_SIZE):
+            recipe_ids.add(recipe_id)
+            if (
+                watermark.last_created_at is None
+                or created_at > watermark.last_created_at
+            ):
+                watermark.last_created_at = created_at
+            count += 1
+        watermark.save()
+        self.stdout.write(REPORT.format(
+            source=model._meta.verbose_name_plural,
+            events=count,
+            recipes=len(recipe_ids),
+        ))
+        return recipe_ids
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        if kwargs['full']:
+            RecipePopularity.objects.all().delete()
+        recipe_ids = set()
+        for model, _ in SOURCES:
+            recipe_ids |= self.touched_recipes(model, kwargs['full'])
+        self.apply_scores(recipe_ids)
+        self.stdout.write(RECOUNT_REPORT.format(recipes=len(recipe_ids)))
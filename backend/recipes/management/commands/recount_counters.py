@@ -0,0 +1,19 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...counters import recount_counters, recount_shopping_carts
+
+COMMAND_HELP = '''recount_counters - пересчитывает счётчики рецептов,
+                избранного, корзин и подписок, а также суммы продуктов
+                в корзинах по данным в базе.
+                '''
+
+
+class Command(BaseCommand):
+    help = COMMAND_HELP
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            recount_counters(apps)
+            recount_shopping_carts(apps)
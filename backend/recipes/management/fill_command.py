@@ -1,6 +1,79 @@
+import csv
 import json
+import os
+import re
+from collections import Counter
+from functools import partial
+from itertools import islice
+from time import monotonic
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.dispatch import Signal
+
+READ_CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 1000
+FORMATS = ('json', 'ndjson', 'csv')
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+FORMAT_HELP = 'Формат файла. По умолчанию определяется по расширению.'
+BATCH_SIZE_HELP = 'Количество записей, сохраняемых в одной транзакции.'
+DRY_RUN_HELP = 'Показать изменения, не записывая их в базу данных.'
+ERROR_INVALID_JSON = 'Файл не содержит корректного json-массива записей'
+ERROR_INVALID_FORMAT = 'Не удалось определить формат файла {filename}'
+ERROR_MISSING_FIELD = 'В записи {record} нет поля {field}'
+PROGRESS = 'Обработано записей: {read}'
+REPORT = (
+    'Прочитано: {read}, добавлено: {created}, обновлено: {updated}, '
+    'без изменений: {unchanged}. Время: {elapsed:.1f} с, '
+    '{rate:.0f} записей/с.'
+)
+DRY_RUN_REPORT = 'Пробный запуск: изменения не сохранены.'
+DIFF_CREATE = '+ {record}'
+DIFF_UPDATE = '~ {key}: {field}: {old!r} -> {new!r}'
+
+# Отправляется после сохранения каждой пачки, поскольку bulk-операции
+# не вызывают post_save.
+catalog_imported = Signal()
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    for chunk in iter(partial(file.read, READ_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError(ERROR_INVALID_JSON)
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield record
+    raise CommandError(ERROR_INVALID_JSON)
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'json': read_json,
+    'ndjson': read_ndjson,
+    'csv': csv.DictReader,
+}
 
 
 class AbstractImportJsonCommand(BaseCommand):
@@ -13,19 +86,131 @@ class AbstractImportJsonCommand(BaseCommand):
             help=self.Meta.data_help,
             default=self.Meta.default_filename,
         )
+        parser.add_argument('--format', choices=FORMATS, help=FORMAT_HELP)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=BATCH_SIZE_HELP,
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help=DRY_RUN_HELP
+        )
 
-    def handle(self, *args, **kwargs):
-        filename = kwargs['filename']
-        with open(
-            filename, 'r', encoding='utf-8'
-        ) as file:
-            self.Meta.model.objects.bulk_create(
-                (self.Meta.model(**record) for record in json.load(file)),
+    def clean_record(self, record):
+        fields = (*self.Meta.key_fields, *self.Meta.update_fields)
+        try:
+            return {field: str(record[field]).strip() for field in fields}
+        except KeyError as error:
+            raise CommandError(
+                ERROR_MISSING_FIELD.format(record=record, field=error)
+            )
+
+    def get_key(self, item, get=dict.__getitem__):
+        return tuple(get(item, field) for field in self.Meta.key_fields)
+
+    def find_changes(self, records):
+        # Запись ищется по всем полям ограничения уникальности модели.
+        existing = {
+            self.get_key(instance, getattr): instance
+            for instance in self.Meta.model.objects.filter(**{
+                f'{field}__in': {key[index] for key in records}
+                for index, field in enumerate(self.Meta.key_fields)
+            })
+        }
+        to_create, to_update = [], []
+        for key, record in records.items():
+            instance = existing.get(key)
+            if instance is None:
+                to_create.append(record)
+            elif all(
+                getattr(instance, field) == record[field]
+                for field in self.Meta.update_fields
+            ):
+                self.stats['unchanged'] += 1
+            else:
+                to_update.append((instance, record))
+        return to_create, to_update
+
+    def print_diff(self, to_create, to_update):
+        for record in to_create:
+            self.stdout.write(DIFF_CREATE.format(record=record))
+        for instance, record in to_update:
+            for field in self.Meta.update_fields:
+                if getattr(instance, field) != record[field]:
+                    self.stdout.write(DIFF_UPDATE.format(
+                        key=', '.join(self.get_key(record)),
+                        field=field,
+                        old=getattr(instance, field),
+                        new=record[field],
+                    ))
+
+    def import_batch(self, records, dry_run):
+        model = self.Meta.model
+        to_create, to_update = self.find_changes({
+            self.get_key(record): record
+            for record in map(self.clean_record, records)
+        })
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        if dry_run:
+            self.print_diff(to_create, to_update)
+            return
+        for instance, record in to_update:
+            for field in self.Meta.update_fields:
+                setattr(instance, field, record[field])
+        with transaction.atomic():
+            model.objects.bulk_create(
+                (model(**record) for record in to_create),
                 ignore_conflicts=True,
             )
+            if to_update:
+                model.objects.bulk_update(
+                    [instance for instance, _ in to_update],
+                    self.Meta.update_fields,
+                )
+            catalog_imported.send(
+                sender=model,
+                updated_ids=[instance.pk for instance, _ in to_update],
+            )
+
+    def get_format(self, filename, file_format):
+        file_format = file_format or os.path.splitext(filename)[1][1:]
+        if file_format not in READERS:
+            raise CommandError(ERROR_INVALID_FORMAT.format(filename=filename))
+        return file_format
+
+    def handle(self, *args, **kwargs):
+        filename = kwargs['filename']
+        file_format = self.get_format(filename, kwargs['format'])
+        self.stats = Counter()
+        started = monotonic()
+        with open(filename, 'r', encoding='utf-8', newline='') as file:
+            records = READERS[file_format](file)
+            while True:
+                batch = list(islice(records, kwargs['batch_size']))
+                if not batch:
+                    break
+                self.stats['read'] += len(batch)
+                self.import_batch(batch, kwargs['dry_run'])
+                if kwargs['verbosity'] > 1:
+                    self.stdout.write(PROGRESS.format(**self.stats))
+        elapsed = monotonic() - started
+        self.stdout.write(REPORT.format(
+            read=self.stats['read'],
+            created=self.stats['created'],
+            updated=self.stats['updated'],
+            unchanged=self.stats['unchanged'],
+            elapsed=elapsed,
+            rate=self.stats['read'] / elapsed if elapsed else 0,
+        ))
+        if kwargs['dry_run']:
+            self.stdout.write(DRY_RUN_REPORT)
 
     class Meta:
         abstract = True
         model = None
+        key_fields = ()
+        update_fields = ()
         default_filename = ''
         data_help = ''
@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-18 02:35
+
+from django.db import migrations
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', recipes.models.FoodgramUserManager()),
+            ],
+        ),
+    ]
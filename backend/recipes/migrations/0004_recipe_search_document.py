@@ -0,0 +1,83 @@
+from django.db import migrations, models
+
+FILL_BATCH_SIZE = 500
+
+SEARCH_SQL = {
+    'postgresql': (
+        (
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+            " GENERATED ALWAYS AS (to_tsvector('russian', search_document))"
+            ' STORED',
+            'CREATE INDEX recipes_recipe_search_vector_idx'
+            ' ON recipes_recipe USING GIN (search_vector)',
+        ),
+        (
+            'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+            'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+        ),
+    ),
+    'sqlite': (
+        (
+            'CREATE VIRTUAL TABLE recipes_recipe_fts'
+            ' USING fts5(search_document)',
+            'INSERT INTO recipes_recipe_fts(rowid, search_document)'
+            ' SELECT id, search_document FROM recipes_recipe',
+        ),
+        (
+            'DROP TABLE IF EXISTS recipes_recipe_fts',
+        ),
+    ),
+}
+
+
+def fill_search_documents(apps, schema_editor):
+    # Рецепты читаются пачками по id, как в export_recipes: иначе
+    # prefetch_related держал бы в памяти всю таблицу.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.order_by('id').only(
+        'id', 'name', 'text'
+    ).prefetch_related('ingredients')
+    last_id = 0
+    while True:
+        chunk = list(recipes.filter(id__gt=last_id)[:FILL_BATCH_SIZE])
+        if not chunk:
+            return
+        for recipe in chunk:
+            recipe.search_document = ' '.join((
+                recipe.name,
+                recipe.text,
+                *(ingredient.name for ingredient in recipe.ingredients.all()),
+            ))
+        Recipe.objects.bulk_update(chunk, ('search_document',))
+        last_id = chunk[-1].id
+
+
+def create_search_index(apps, schema_editor):
+    for statement in SEARCH_SQL.get(
+        schema_editor.connection.vendor, ((), ())
+    )[0]:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in SEARCH_SQL.get(
+        schema_editor.connection.vendor, ((), ())
+    )[1]:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_name_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 03:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shopping_cart_ingredient'),
+    ]
+
+    # Промежуточная таблица ярлыков создаётся автоматически, и индекс
+    # в Meta ей не задать. Составной индекс покрывает фильтр по ярлыкам:
+    # recipe_id читается прямо из индекса по tag_id.
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx'
+            ' ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX IF EXISTS recipes_recipe_tags_tag_recipe_idx',
+        ),
+    ]
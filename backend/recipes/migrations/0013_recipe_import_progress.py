@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-18 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_tags_tag_recipe_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImportProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='Файл')),
+                ('size', models.BigIntegerField(verbose_name='Размер, байт')),
+                ('modified_ns', models.BigIntegerField(verbose_name='Время изменения, нс')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний загруженный id')),
+            ],
+            options={
+                'verbose_name': 'Незавершённая загрузка рецептов',
+                'verbose_name_plural': 'Незавершённые загрузки рецептов',
+                'ordering': ('filename',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimportprogress',
+            constraint=models.UniqueConstraint(fields=('filename', 'size', 'modified_ns'), name='unique_recipe_import_file'),
+        ),
+    ]
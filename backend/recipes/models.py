@@ -1,7 +1,22 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Greatest
 
+from .counters import CountersModelMixin
 from .validators import validate_username
 
 MAX_TAG_NAME_LENGTH = 32
@@ -12,6 +27,8 @@ MAX_MEASUREMENT_UNIT_LENGTH = 64
 MIN_COOKING_TIME = 1
 MIN_INGREDIENT_AMOUNT = 1
 MAX_SHORT_URL_LENGTH = 32
+MAX_WATERMARK_SOURCE_LENGTH = 64
+MAX_IMPORT_FILENAME_LENGTH = 255
 ERROR_MORE_INGREDIENT = (
     'Количество продукта должно быть не менее '
     f'{MIN_INGREDIENT_AMOUNT}'
@@ -27,7 +44,35 @@ MAX_PASSWORD_LENGTH = 150
 MAX_EMAILFIELD_LENGTH = 254
 
 
-class User(AbstractUser):
+class UserQuerySet(models.QuerySet):
+
+    def with_is_subscribed(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user,
+                author=OuterRef('pk'),
+            )),
+        )
+
+    def with_recipes(self, recipes_limit=None):
+        return self.prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=Recipe.objects.previews(recipes_limit),
+                to_attr='recipes_preview',
+            ),
+        )
+
+
+class FoodgramUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(CountersModelMixin, AbstractUser):
     username = models.CharField(
         verbose_name='Ник',
         max_length=MAX_USERNAME_LENGTH,
@@ -63,10 +108,32 @@ class User(AbstractUser):
         null=True,
         default=None,
     )
+    avatar_renditions = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='Уменьшенные копии аватара',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецепты',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчики',
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписки',
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
+    objects = FoodgramUserManager()
+
     def __str__(self):
         return self.username
 
@@ -101,7 +168,7 @@ class Subscription(models.Model):
         )
 
 
-class Tag(models.Model):
+class Tag(CountersModelMixin, models.Model):
     name = models.CharField(
         unique=True,
         max_length=MAX_RECIPE_NAME_LENGTH,
@@ -115,6 +182,11 @@ class Tag(models.Model):
         verbose_name='Идентификатор',
         help_text='Введите идентификатор',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В рецептах',
+    )
 
     class Meta:
         ordering = ('slug',)
@@ -125,7 +197,7 @@ class Tag(models.Model):
         return self.slug
 
 
-class Ingredient(models.Model):
+class Ingredient(CountersModelMixin, models.Model):
     name = models.CharField(
         max_length=MAX_RECIPE_NAME_LENGTH,
         verbose_name='Название продукта',
@@ -137,6 +209,11 @@ class Ingredient(models.Model):
         verbose_name='Единица измерения',
         help_text='Введите название единицы измерения',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В рецептах',
+    )
 
     class Meta:
         ordering = ('name',)
@@ -153,7 +230,46 @@ class Ingredient(models.Model):
         return f'{self.name[:STR_MAX_LENGHT]} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user,
+                recipe=OuterRef('pk'),
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user,
+                recipe=OuterRef('pk'),
+            )),
+        )
+
+    def with_related(self, user):
+        # Ярлыки и продукты читаются только для рецептов, которых нет
+        # в кэше представлений, поэтому заранее подгружается лишь автор.
+        return self.with_user_flags(user).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.with_is_subscribed(user),
+            ),
+        )
+
+    def previews(self, recipes_limit=None):
+        if recipes_limit is None:
+            return self.all()
+        return self.filter(pk__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author'),
+            ).values('pk')[:recipes_limit]
+        ))
+
+
+class Recipe(CountersModelMixin, models.Model):
     name = models.CharField(
         null=False,
         blank=False,
@@ -183,6 +299,11 @@ class Recipe(models.Model):
         verbose_name='Изображение блюда',
         help_text='Загрузите изображение блюда',
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
         help_text='Введите описание рецепта',
@@ -203,12 +324,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Поисковый документ',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+        )
 
     def __str__(self):
         return (
@@ -271,6 +420,11 @@ class AbstractUserRecipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Добавлен',
+    )
 
     class Meta:
         abstract = True
@@ -299,3 +453,164 @@ class ShoppingCart(AbstractUserRecipe):
     class Meta(AbstractUserRecipe.Meta):
         verbose_name = 'Продуктовая корзина'
         verbose_name_plural = 'Продуктовые корзины'
+
+
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+
+    def shift_amounts(self, user_ids, amounts):
+        # Суммы продуктов в корзинах меняются на одни и те же величины
+        # у всех пользователей: недостающие строки вставляются с нулём,
+        # после чего все суммы сдвигаются одним UPDATE. Строку, которую
+        # успел вставить параллельный запрос, вставка пропускает, и сдвиг
+        # применяется к ней. Обнулившиеся строки удаляются.
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not amounts:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=amounts)
+        existing = set(items.values_list('user_id', 'ingredient_id'))
+        self.bulk_create(
+            (
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items()
+                if amount > 0 and (user_id, ingredient_id) not in existing
+            ),
+            ignore_conflicts=True,
+        )
+        items.update(amount=Greatest(F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(amount))
+                for ingredient_id, amount in amounts.items()
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ), 0))
+        if any(amount < 0 for amount in amounts.values()):
+            items.filter(amount__lte=0).delete()
+
+    def shift_recipe(self, user_ids, recipe_id, sign=1):
+        self.shift_amounts(user_ids, {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', 'amount')
+        })
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Продукт',
+    )
+    amount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Продукт в корзине'
+        verbose_name_plural = 'Продукты в корзинах'
+        default_related_name = 'shopping_cart_ingredients'
+        ordering = ('user', 'ingredient')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient',
+            ),
+        )
+
+    def __str__(self):
+        return (
+            f'{self.user.username}: {self.ingredient.name} {self.amount} '
+            f'{self.ingredient.measurement_unit}'
+        )
+
+
+class RecipePopularity(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт',
+    )
+    # Двоичный логарифм суммы весов событий.
+    score = models.FloatField(
+        default=0,
+        db_index=True,
+        verbose_name='Популярность',
+    )
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        ordering = ('-score',)
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score}'
+
+
+class PopularityWatermark(models.Model):
+    source = models.CharField(
+        unique=True,
+        max_length=MAX_WATERMARK_SOURCE_LENGTH,
+        verbose_name='Источник',
+    )
+    last_created_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Время последнего учтённого события',
+    )
+
+    class Meta:
+        verbose_name = 'Отметка пересчёта популярности'
+        verbose_name_plural = 'Отметки пересчёта популярности'
+        ordering = ('source',)
+
+    def __str__(self):
+        return f'{self.source}: {self.last_created_at}'
+
+
+class RecipeImportProgress(models.Model):
+    # Файл узнаётся по имени, размеру и времени изменения: изменённая
+    # выгрузка загружается с начала. Запись удаляется после загрузки.
+    filename = models.CharField(
+        max_length=MAX_IMPORT_FILENAME_LENGTH,
+        verbose_name='Файл',
+    )
+    size = models.BigIntegerField(verbose_name='Размер, байт')
+    modified_ns = models.BigIntegerField(verbose_name='Время изменения, нс')
+    last_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Последний загруженный id',
+    )
+
+    class Meta:
+        verbose_name = 'Незавершённая загрузка рецептов'
+        verbose_name_plural = 'Незавершённые загрузки рецептов'
+        ordering = ('filename',)
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_recipe_import_file',
+                fields=['filename', 'size', 'modified_ns'],
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.filename}: {self.last_id}'
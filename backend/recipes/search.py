@@ -0,0 +1,77 @@
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+SEARCH_UPDATE_BATCH_SIZE = 500
+SEARCH_SQL = {
+    'postgresql': (
+        'SELECT id FROM recipes_recipe WHERE search_vector'
+        f' @@ websearch_to_tsquery(\'{SEARCH_CONFIG}\', %s)',
+        'ts_rank(recipes_recipe.search_vector,'
+        f' websearch_to_tsquery(\'{SEARCH_CONFIG}\', %s))',
+    ),
+    'sqlite': (
+        'SELECT rowid FROM recipes_recipe_fts'
+        ' WHERE recipes_recipe_fts MATCH %s',
+        '(SELECT -bm25(recipes_recipe_fts) FROM recipes_recipe_fts'
+        ' WHERE recipes_recipe_fts MATCH %s'
+        ' AND recipes_recipe_fts.rowid = recipes_recipe.id)',
+    ),
+}
+
+
+def build_search_document(name, text, ingredient_names):
+    return ' '.join((name, text, *ingredient_names))
+
+
+def update_search_documents(recipes, batch_size=SEARCH_UPDATE_BATCH_SIZE):
+    recipe_ids = list(recipes.values_list('id', flat=True))
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipes.model.objects.filter(
+            id__in=recipe_ids[start:start + batch_size]
+        ).only('id', 'name', 'text').prefetch_related('ingredients')
+        for recipe in batch:
+            recipe.search_document = build_search_document(
+                recipe.name,
+                recipe.text,
+                (ingredient.name for ingredient in recipe.ingredients.all()),
+            )
+        recipes.model.objects.bulk_update(batch, ('search_document',))
+        sync_search_index(recipes.db, batch)
+
+
+def sync_search_index(using, recipes):
+    # На SQLite поиск идёт по отдельной таблице FTS5: триггеры не пережили бы
+    # пересоздание таблицы рецептов в миграциях, поэтому она обновляется здесь.
+    # Строки удалённых рецептов не мешают: выборка ограничена recipes_recipe.
+    if connections[using].vendor != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            'INSERT OR REPLACE INTO recipes_recipe_fts(rowid, search_document)'
+            ' VALUES (%s, %s)',
+            [(recipe.id, recipe.search_document) for recipe in recipes],
+        )
+
+
+def to_fts5_query(query):
+    return ' '.join(
+        '"{0}"*'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def search_recipes(recipes, query):
+    if not query.strip():
+        return recipes
+    vendor = connections[recipes.db].vendor
+    if vendor not in SEARCH_SQL:
+        return recipes.filter(search_document__icontains=query)
+    if vendor == 'sqlite':
+        query = to_fts5_query(query)
+    match_sql, rank_sql = SEARCH_SQL[vendor]
+    return recipes.filter(
+        pk__in=RawSQL(match_sql, (query,))
+    ).annotate(
+        search_rank=RawSQL(rank_sql, (query,), output_field=FloatField())
+    ).order_by('-search_rank', '-pub_date')
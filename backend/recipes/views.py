@@ -2,9 +2,11 @@ from django.conf import settings
 from django.http import Http404
 from django.shortcuts import redirect
 
+from .executor import as_async_view
 from .models import Recipe
 
 
+@as_async_view
 def get_recipe(request, pk):
     if Recipe.objects.filter(id=pk).exists():
         return redirect(